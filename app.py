@@ -1,10 +1,29 @@
 import os
-from flask import Flask, request, render_template, jsonify, redirect, url_for
+import math
+import time
+import json
+import uuid
+import shutil
+import hashlib
+from flask import Flask, request, render_template, jsonify, redirect, url_for, Response, stream_with_context, g
 from werkzeug.utils import secure_filename
-from data_processor import DataProcessor
+from data_processor import DataProcessor, new_dataset_version
+from dataset import Dataset
+from search_index import SearchIndex
 from recommender import Recommender
+from recommendation_export import RecommendationExporter
 from deepseek_service import DeepSeekService
-from config import UPLOAD_FOLDER, MAX_FILE_SIZE, allowed_file
+from recommendation_cache import RecommendationCache
+from background_jobs import BackgroundJobs, JobStore
+from dataset_registry import DatasetRegistry
+from metrics import METRICS
+from config import (
+    UPLOAD_FOLDER, MAX_FILE_SIZE, allowed_file, SNAPSHOT_FOLDER, SNAPSHOT_KEEP, SNAPSHOT_CHECK_INTERVAL,
+    DEFAULT_PROVINCE, DEFAULT_YEAR, DEFAULT_BATCH, DATASET_MEMORY_BUDGET,
+    RECOMMEND_CACHE_MAX_ENTRIES, RECOMMEND_CACHE_MAX_BYTES, RECOMMEND_CACHE_RANK_BUCKET,
+    BACKGROUND_WORKERS, BACKGROUND_JOB_TTL, JOB_STORE_PATH, STRATEGY_WORKERS, STRATEGY_MAX_PENDING, MAX_BATCH_ANALYSIS_ITEMS, HTTP_CACHE_MAX_AGE,
+    MAX_BATCH_RECOMMEND_STUDENTS
+)
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
@@ -14,21 +33,158 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 # 全局变量
-data_processor = DataProcessor()
+# 数据集注册表：按(省份, 年份, 批次)保存只读的Dataset，更新数据时整体替换；请求处理中只获取一次，不会看到半成品数据
+registry = DatasetRegistry(
+    SNAPSHOT_FOLDER,
+    memory_budget=DATASET_MEMORY_BUDGET,
+    default_key=(DEFAULT_PROVINCE, DEFAULT_YEAR, DEFAULT_BATCH),
+    keep=SNAPSHOT_KEEP,
+    check_interval=SNAPSHOT_CHECK_INTERVAL
+)
 deepseek_service = DeepSeekService()
-recommender = Recommender(data_processor)
-data_loaded = False
+recommendation_cache = RecommendationCache(
+    max_entries=RECOMMEND_CACHE_MAX_ENTRIES,
+    max_bytes=RECOMMEND_CACHE_MAX_BYTES,
+    rank_bucket=RECOMMEND_CACHE_RANK_BUCKET
+)
+# 任务状态写入共享存储，上传进度和AI策略的查询可以落到任一worker进程
+job_store = JobStore(JOB_STORE_PATH)
+background_jobs = BackgroundJobs(max_workers=BACKGROUND_WORKERS, ttl=BACKGROUND_JOB_TTL, store=job_store)
+# AI策略生成等待API响应、耗时长，使用单独的有界线程池，不与数据处理互相阻塞
+strategy_jobs = BackgroundJobs(
+    max_workers=STRATEGY_WORKERS, ttl=BACKGROUND_JOB_TTL, store=job_store,
+    max_pending=STRATEGY_MAX_PENDING, name='strategy-job'
+)
+
+# 启动时预先挂载默认数据集的最新快照，其他数据集在首次查询时加载
+# （快照以内存映射方式加载，多个worker进程挂载同一快照时共享物理内存）
+registry.get(registry.default_key)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    """按接口、方法和状态码记录耗时（流式响应只计到开始返回为止）"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        METRICS.observe(
+            'http_request_duration_seconds', time.perf_counter() - started,
+            endpoint=request.url_rule.rule if request.url_rule is not None else 'unmatched',
+            method=request.method, status=response.status_code
+        )
+    return response
+
+def run_strategy_job(job, recommendations_data, user_rank, track):
+    """后台任务：流式生成AI志愿填报策略，生成过程中不断更新任务结果"""
+    strategy = ''
+    for chunk in deepseek_service.stream_volunteer_strategy(recommendations_data, user_rank, track):
+        strategy += chunk
+        job.update(result=strategy)
+    return strategy
+
+def selected_dataset_key():
+    """从请求中取出数据集选择（province/year/batch，可放在查询参数、表单或JSON中），缺省项使用默认数据集"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    values = [data.get(name) or request.values.get(name) for name in ('province', 'year', 'batch')]
+    return registry.normalize_key(*values)
+
+def selected_dataset():
+    """请求选择的数据集，未上传数据时返回None"""
+    return registry.get(selected_dataset_key())
+
+def request_etag(*parts):
+    """强ETag：由数据集版本和规范化后的请求参数计算，同一数据集版本下相同的请求得到相同的响应"""
+    payload = json.dumps([request.path] + list(parts), ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def not_modified(etag):
+    """GET/HEAD请求的If-None-Match与ETag一致时返回304响应，否则返回None"""
+    if request.method in ('GET', 'HEAD') and request.if_none_match.contains_weak(etag):
+        return cacheable(Response(status=304), etag)
+    return None
+
+def cacheable(response, etag):
+    """设置ETag和缓存头，浏览器和反向代理可以缓存响应并在过期后重新验证"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={HTTP_CACHE_MAX_AGE}, must-revalidate'
+    return response
+
+def run_ingest_job(job, key, upload_dir, saved_files, version):
+    """后台任务：用新的DataProcessor处理上传的文件，完成后发布为对应省份/年份/批次的只读数据集；
+    version在上传时生成，同一数据集的多次上传以最后上传的为准（不论哪个先处理完）"""
+    stages = []
+
+    def report(stage_index, total_stages, stage_name, status, message):
+        if stage_index > len(stages):
+            stages.append({'name': stage_name, 'status': status, 'message': message})
+        else:
+            stages[stage_index - 1].update(status=status, message=message)
+        job.update(result={
+            'stage': stage_name,
+            'stage_index': stage_index,
+            'total_stages': total_stages,
+            'stages': [dict(stage) for stage in stages]
+        })
+
+    try:
+        processor = DataProcessor()
+        success, message = processor.process_all_data(
+            saved_files['score_rank'],
+            saved_files['cutoff'],
+            saved_files['plan'],
+            progress=report,
+            version=version
+        )
+        if not success:
+            raise RuntimeError(message)
+
+        # 发布后保存快照，并改用内存映射的快照，与其他进程共享同一份内存
+        new_dataset = Dataset.from_processor(processor)
+        published, snapshot_success, snapshot_message = registry.publish(key, new_dataset)
+        if not published:
+            raise RuntimeError(snapshot_message)
+        recommendation_cache.clear()
+        print(f"{'💾' if snapshot_success else '⚠️'} {snapshot_message}")
+        return dict(job.result, dataset_version=new_dataset.version)
+    finally:
+        # 数据已在内存和快照中，上传的原始文件不再需要
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+def sse_event(data, event=None):
+    """格式化一条server-sent event"""
+    message = f'event: {event}\n' if event else ''
+    return message + f'data: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+def sse_response(events):
+    """以text/event-stream流式返回事件，并关闭代理缓冲"""
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def submit_strategy_job(recommendations_data, user_rank, track):
+    """提交AI策略生成任务；策略只取决于位次、科目和冲稳保数量，输入相同的请求共用同一个任务；
+    策略任务排队已满时返回None（本次推荐不附带策略）"""
+    counts = [len(recommendations_data.get(key, [])) for key in ('冲', '稳', '保')]
+    job_key = hashlib.sha1(json.dumps([user_rank, track, counts], ensure_ascii=False).encode('utf-8')).hexdigest()
+    return strategy_jobs.submit(
+        run_strategy_job, recommendations_data, user_rank, track,
+        job_id=f'strategy-{job_key[:16]}'
+    )
 
 @app.route('/')
 def index():
     """主页"""
-    return render_template('index.html', data_loaded=data_loaded)
+    return render_template('index.html', data_loaded=registry.get(registry.default_key) is not None)
 
 @app.route('/upload', methods=['POST'])
 def upload_files():
-    """文件上传接口"""
-    global data_loaded
-    
+    """文件上传接口 - 保存文件后在后台处理数据，返回任务ID供查询进度"""
     try:
         # 检查是否有文件
         if 'score_rank_file' not in request.files or \
@@ -49,39 +205,72 @@ def upload_files():
             if file.filename and not allowed_file(file.filename):
                 return jsonify({'success': False, 'message': f'{key}文件格式不正确，请上传Excel文件'})
         
-        # 保存文件
+        dataset_key = selected_dataset_key()
+
+        # 保存文件（每次上传使用单独的目录，并发上传互不覆盖）
+        job_id = f'upload-{uuid.uuid4().hex}'
+        upload_dir = os.path.join(app.config['UPLOAD_FOLDER'], job_id)
+        os.makedirs(upload_dir, exist_ok=True)
         saved_files = {}
         for key, file in files.items():
             if file.filename:
                 filename = secure_filename(file.filename)
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{key}_{filename}")
+                filepath = os.path.join(upload_dir, f"{key}_{filename}")
                 file.save(filepath)
                 saved_files[key] = filepath
         
-        # 处理数据
-        success, message = data_processor.process_all_data(
-            saved_files['score_rank'],
-            saved_files['cutoff'], 
-            saved_files['plan']
-        )
-        
-        if success:
-            data_loaded = True
-            return jsonify({'success': True, 'message': '文件上传和数据处理成功！'})
-        else:
-            return jsonify({'success': False, 'message': f'数据处理失败: {message}'})
+        # 后台处理数据
+        background_jobs.submit(run_ingest_job, dataset_key, upload_dir, saved_files, new_dataset_version(), job_id=job_id)
+        return jsonify({'success': True, 'message': '文件上传成功，正在处理数据...', 'job_id': job_id})
             
     except Exception as e:
         return jsonify({'success': False, 'message': f'上传失败: {str(e)}'})
 
-@app.route('/recommend', methods=['POST'])
+@app.route('/upload/<job_id>')
+def get_upload_job(job_id):
+    """查询数据处理任务的进度"""
+    job = background_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'status': 'missing', 'message': '数据处理任务不存在或已过期'}), 404
+
+    info = job.to_dict()
+    if info['status'] == 'failed':
+        message = f"数据处理失败: {info['error']}"
+    elif info['status'] == 'done':
+        message = '文件上传和数据处理成功！'
+    else:
+        message = '正在处理数据...'
+
+    return jsonify({
+        'success': info['status'] != 'failed',
+        'status': info['status'],
+        'progress': info['result'],
+        'message': message
+    })
+
+def recommend_request_data():
+    """推荐请求的参数：POST为JSON；GET为查询参数（majors可重复或用逗号分隔，布尔项取1/true）"""
+    if request.method == 'POST':
+        return request.json
+    args = request.args
+    return {
+        'rank': args.get('rank'),
+        'track': args.get('track'),
+        'cities': [city for value in args.getlist('cities') for city in value.split(',') if city],
+        'is_985': args.get('is_985', '').lower() in ('1', 'true', 'on'),
+        'is_211': args.get('is_211', '').lower() in ('1', 'true', 'on'),
+        'majors': [major for value in args.getlist('majors') for major in value.split(',') if major]
+    }
+
+@app.route('/recommend', methods=['GET', 'POST'])
 def get_recommendations():
-    """获取推荐结果"""
-    if not data_loaded:
+    """获取推荐结果；GET请求可被浏览器和反向代理缓存，按ETag重新验证"""
+    current = selected_dataset()  # 只获取一次，后台替换数据集不影响本次请求
+    if current is None:
         return jsonify({'success': False, 'message': '请先上传数据文件'})
     
     try:
-        data = request.json
+        data = recommend_request_data()
         user_rank = data.get('rank')
         track = data.get('track')
         
@@ -102,28 +291,135 @@ def get_recommendations():
         if data.get('majors'):
             filters['majors'] = data['majors']
         
-        # 生成推荐
-        result = recommender.generate_recommendations(user_rank, track, filters)
+        # 客户端缓存仍然有效时直接返回304，不生成推荐也不提交AI策略任务
+        etag = request_etag(
+            current.version, user_rank, track, RecommendationCache.normalize_filters(filters)
+        )
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        
+        # 生成推荐（相同数据集版本下的相同查询直接命中缓存）
+        recommender = Recommender(current)
+        result = recommendation_cache.get_or_compute(
+            current.version,
+            current.get_recommendation_index(),
+            user_rank, track, filters,
+            lambda: recommender.generate_recommendations(user_rank, track, filters)
+        )
         
-        # 如果成功生成推荐，添加AI策略建议
+        # 如果成功生成推荐，在后台生成AI策略建议，前端通过 /strategy/<job_id> 获取
+        # （任务号由请求内容决定，重新验证得到304时沿用客户端缓存的任务号）
         if result['success']:
-            strategy_result = deepseek_service.generate_volunteer_strategy(
-                result['data'], user_rank, track
-            )
-            if strategy_result['success']:
-                result['strategy'] = strategy_result['strategy']
+            result['strategy_job'] = submit_strategy_job(result['data'], user_rank, track)
         
-        return jsonify(result)
+        return cacheable(jsonify(result), etag)
         
     except ValueError:
         return jsonify({'success': False, 'message': '位次必须是数字'})
     except Exception as e:
         return jsonify({'success': False, 'message': f'推荐生成失败: {str(e)}'})
 
+def parse_student(data):
+    """批量请求中的一名考生：{'rank', 'track', 'filters', 'id'}，参数有误时为{'error', 'id'}"""
+    data = data if isinstance(data, dict) else {}
+    if not data.get('rank') or not data.get('track'):
+        return {'error': '请输入位次和选择科目', 'id': data.get('id')}
+    try:
+        user_rank = int(data['rank'])
+    except (ValueError, TypeError):
+        return {'error': '位次必须是数字', 'id': data.get('id')}
+    filters = {name: True for name in ('is_985', 'is_211') if data.get(name)}
+    if data.get('majors'):
+        filters['majors'] = data['majors']
+    return {'rank': user_rank, 'track': data['track'], 'filters': filters, 'id': data.get('id')}
+
+@app.route('/recommend_batch', methods=['POST'])
+def recommend_batch():
+    """批量推荐（整个班级）- 请求体{'students': [{'rank', 'track', 'is_985', 'is_211', 'majors', 'id'}, ...]}，
+    按输入顺序以NDJSON逐行返回，每行为一个考生的推荐结果（与/recommend相同，另带index和id）"""
+    current = selected_dataset()
+    if current is None:
+        return jsonify({'success': False, 'message': '请先上传数据文件'})
+
+    students = (request.get_json(silent=True) or {}).get('students')
+    if not isinstance(students, list) or not students:
+        return jsonify({'success': False, 'message': '请提供考生列表'})
+    if len(students) > MAX_BATCH_RECOMMEND_STUDENTS:
+        return jsonify({'success': False, 'message': f'单次最多{MAX_BATCH_RECOMMEND_STUDENTS}名考生'})
+
+    # 参数有误的考生单独返回错误，不影响其他考生
+    students = [parse_student(student) for student in students]
+    valid = [student for student in students if 'error' not in student]
+
+    def lines():
+        # 响应头已发出，之后出错时为受影响的每个考生返回错误行，客户端可以区分出错与完整返回
+        results = Recommender(current).generate_recommendations_batch(
+            [(student['rank'], student['track'], student['filters']) for student in valid]
+        )
+        failure = None
+        for index, student in enumerate(students):
+            if 'error' in student:
+                result = {'success': False, 'message': student['error'], 'data': {'冲': [], '稳': [], '保': []}}
+            elif failure is not None:
+                result = Recommender.failure_result(failure)
+            else:
+                try:
+                    result = next(results)
+                except Exception as e:
+                    failure = str(e) or type(e).__name__
+                    result = Recommender.failure_result(failure)
+            yield json.dumps(dict(result, index=index, id=student.get('id')), ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+
+@app.route('/export', methods=['GET', 'POST'])
+def export_recommendations():
+    """导出推荐结果为Excel或CSV，边生成边分块返回：
+    POST请求体{'students': [...], 'format': 'xlsx'|'csv'}导出多名考生；GET参数与GET /recommend相同，导出一名考生"""
+    current = selected_dataset()
+    if current is None:
+        return jsonify({'success': False, 'message': '请先上传数据文件'})
+
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        students = data.get('students')
+        if not isinstance(students, list) or not students:
+            return jsonify({'success': False, 'message': '请提供考生列表'})
+    else:
+        data = request.args
+        students = [recommend_request_data()]
+    if len(students) > MAX_BATCH_RECOMMEND_STUDENTS:
+        return jsonify({'success': False, 'message': f'单次最多{MAX_BATCH_RECOMMEND_STUDENTS}名考生'})
+
+    export_format = data.get('format', 'xlsx')
+    if export_format not in ('xlsx', 'csv'):
+        return jsonify({'success': False, 'message': 'format只能是xlsx或csv'})
+
+    students = [parse_student(student) for student in students]
+    for index, student in enumerate(students):
+        if 'error' in student:
+            return jsonify({'success': False, 'message': f"第{index + 1}名考生: {student['error']}"})
+
+    exporter = RecommendationExporter(Recommender(current))
+    if export_format == 'csv':
+        chunks, mimetype = exporter.csv(students), 'text/csv; charset=utf-8'
+    else:
+        chunks, mimetype = exporter.xlsx(students), \
+            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename=recommendations.{export_format}',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @app.route('/analyze_major', methods=['POST'])
 def analyze_major():
     """获取专业分析"""
-    if not data_loaded:
+    if selected_dataset() is None:
         return jsonify({'success': False, 'message': '请先上传数据文件'})
     
     try:
@@ -145,6 +441,96 @@ def analyze_major():
     except Exception as e:
         return jsonify({'success': False, 'message': f'专业分析失败: {str(e)}'})
 
+@app.route('/strategy/<job_id>')
+def get_strategy(job_id):
+    """查询AI策略生成任务"""
+    job = strategy_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'status': 'missing', 'message': '策略任务不存在或已过期'}), 404
+
+    info = job.to_dict()
+    return jsonify({
+        'success': info['status'] != 'failed',
+        'status': info['status'],
+        'strategy': info['result'],
+        'message': info['error'] or ''
+    })
+
+@app.route('/strategy/<job_id>/stream')
+def stream_strategy(job_id):
+    """以SSE流式推送AI策略生成任务的文本"""
+    job = strategy_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'status': 'missing', 'message': '策略任务不存在或已过期'}), 404
+
+    def events():
+        sent = 0
+        while True:
+            info = job.to_dict()
+            strategy = info['result'] or ''
+            if len(strategy) > sent:
+                yield sse_event({'delta': strategy[sent:]})
+                sent = len(strategy)
+            if info['status'] == 'done':
+                yield sse_event({}, event='done')
+                return
+            if info['status'] == 'failed':
+                yield sse_event({'message': info['error']}, event='failed')
+                return
+            if job.wait_for_update(info['revision'], timeout=15) == info['revision']:
+                # 长时间无新内容时发送注释行保持连接
+                yield ': keep-alive\n\n'
+
+    return sse_response(events())
+
+@app.route('/analyze_major/stream')
+def stream_analyze_major():
+    """以SSE流式推送专业分析，首个token生成后即开始返回"""
+    if selected_dataset() is None:
+        return jsonify({'success': False, 'message': '请先上传数据文件'})
+
+    school_name = request.args.get('school_name')
+    major_name = request.args.get('major_name')
+    user_rank = request.args.get('user_rank', type=int)
+    cutoff_rank = request.args.get('cutoff_rank', type=int)
+
+    if not all([school_name, major_name, user_rank, cutoff_rank]):
+        return jsonify({'success': False, 'message': '缺少必要参数'})
+
+    def events():
+        try:
+            for chunk in deepseek_service.stream_major_analysis(school_name, major_name, user_rank, cutoff_rank):
+                yield sse_event({'delta': chunk})
+            yield sse_event({}, event='done')
+        except Exception as e:
+            yield sse_event({'message': f'专业分析生成失败: {str(e)}'}, event='failed')
+
+    return sse_response(events())
+
+@app.route('/analyze_majors', methods=['POST'])
+def analyze_majors():
+    """批量专业分析 - 并发生成，按完成顺序以NDJSON逐行返回"""
+    if selected_dataset() is None:
+        return jsonify({'success': False, 'message': '请先上传数据文件'})
+
+    data = request.json or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'message': '请提供需要分析的专业列表'})
+    if len(items) > MAX_BATCH_ANALYSIS_ITEMS:
+        return jsonify({'success': False, 'message': f'单次最多分析{MAX_BATCH_ANALYSIS_ITEMS}个专业'})
+
+    # 各条目未给出考生位次时使用请求中的统一位次
+    user_rank = data.get('user_rank')
+    items = [dict(item, user_rank=item.get('user_rank', user_rank)) if isinstance(item, dict) else {} for item in items]
+
+    def lines():
+        for index, result in deepseek_service.generate_major_analyses(items):
+            yield json.dumps(dict(result, index=index, school_name=items[index].get('school_name'),
+                                  major_name=items[index].get('major_name')), ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+
 @app.route('/test_deepseek')
 def test_deepseek():
     """测试DeepSeek API连接"""
@@ -154,24 +540,39 @@ def test_deepseek():
 @app.route('/score_to_rank', methods=['POST'])
 def score_to_rank():
     """分数转位次"""
-    if not data_loaded:
+    current = selected_dataset()
+    if current is None:
         return jsonify({'success': False, 'message': '请先上传数据文件'})
     
     try:
         data = request.json
-        score = data.get('score')
+        scores = data.get('scores')
         track = data.get('track', '物理')
+
+        # 批量转换：分数数组输入，位次数组输出
+        if scores is not None:
+            if not isinstance(scores, list) or not scores:
+                return jsonify({'success': False, 'message': '请输入分数列表'})
+
+            scores = [int(score) for score in scores]
+            ranks = current.scores_to_ranks(scores)
+            return cacheable(jsonify({
+                'success': True,
+                'ranks': [None if math.isnan(rank) else int(rank) for rank in ranks]
+            }), request_etag(current.version, scores))
+
+        score = data.get('score')
         
         if not score:
             return jsonify({'success': False, 'message': '请输入分数'})
         
-        rank = data_processor.score_to_rank(int(score), track)
+        rank = current.score_to_rank(int(score), track)
         if rank:
-            return jsonify({'success': True, 'rank': rank})
+            return cacheable(jsonify({'success': True, 'rank': rank}), request_etag(current.version, int(score)))
         else:
             return jsonify({'success': False, 'message': '找不到对应位次，可能分数超出范围'})
             
-    except ValueError:
+    except (ValueError, TypeError):
         return jsonify({'success': False, 'message': '分数必须是数字'})
     except Exception as e:
         return jsonify({'success': False, 'message': f'转换失败: {str(e)}'})
@@ -179,28 +580,125 @@ def score_to_rank():
 @app.route('/get_filters')
 def get_filters():
     """获取筛选选项"""
-    if not data_loaded:
+    current = selected_dataset()
+    if current is None:
         return jsonify({'success': False, 'message': '请先上传数据文件'})
     
     try:
-        cities = data_processor.get_available_cities()
-        majors = data_processor.get_available_majors()
-        
-        return jsonify({
+        # 筛选项目录在构建数据集时已计算好，数据集版本不变时浏览器可直接使用缓存
+        etag = request_etag(current.version)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
+        return cacheable(jsonify({
             'success': True,
-            'cities': cities,
-            'majors': majors
-        })
+            'cities': current.get_available_cities(),
+            'majors': current.get_available_majors()
+        }), etag)
     except Exception as e:
         return jsonify({'success': False, 'message': f'获取筛选选项失败: {str(e)}'})
 
+@app.route('/search')
+def search():
+    """院校/专业联想搜索：GET /search?q=计算&type=major&limit=10"""
+    current = selected_dataset()
+    if current is None:
+        return jsonify({'success': False, 'message': '请先上传数据文件'})
+
+    try:
+        query = request.args.get('q', '').strip()
+        kind = request.args.get('type') or None
+        if kind is not None and kind not in SearchIndex.KINDS:
+            return jsonify({'success': False, 'message': 'type只能是school或major'})
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+
+        etag = request_etag(current.version, query, kind, limit)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
+        return cacheable(jsonify({
+            'success': True,
+            'query': query,
+            'results': current.search(query, kind, limit)
+        }), etag)
+    except (ValueError, TypeError):
+        return jsonify({'success': False, 'message': 'limit必须是整数'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'搜索失败: {str(e)}'})
+
+@app.route('/cache_stats')
+def get_cache_stats():
+    """获取推荐结果缓存和AI回复缓存统计"""
+    return jsonify({
+        'success': True,
+        'recommendation_cache': recommendation_cache.stats(),
+        'deepseek_cache': deepseek_service.cache.stats(),
+        'datasets': registry.stats()
+    })
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus指标：各数据处理阶段和接口的耗时直方图、推荐筛选行数、缓存命中率、数据集大小"""
+    cache = recommendation_cache.stats()
+    METRICS.sync('recommendation_cache_hits_total', cache['hits'])
+    METRICS.sync('recommendation_cache_misses_total', cache['misses'])
+    METRICS.set('recommendation_cache_hit_ratio', cache['hit_rate'])
+    METRICS.set('recommendation_cache_entries', cache['entries'])
+    METRICS.set('recommendation_cache_bytes', cache['bytes'])
+
+    ai_cache = deepseek_service.cache.stats()
+    ai_lookups = ai_cache['hits'] + ai_cache['misses']
+    METRICS.sync('deepseek_cache_hits_total', ai_cache['hits'])
+    METRICS.sync('deepseek_cache_misses_total', ai_cache['misses'])
+    METRICS.set('deepseek_cache_hit_ratio', round(ai_cache['hits'] / ai_lookups, 4) if ai_lookups else 0)
+
+    # 已淘汰的数据集不再输出
+    datasets = registry.stats()
+    METRICS.clear('dataset_rows')
+    METRICS.clear('dataset_bytes')
+    for entry in datasets['resident']:
+        METRICS.set('dataset_rows', entry['rows'], dataset=entry['key'])
+        for table, size in entry['tables'].items():
+            METRICS.set('dataset_bytes', size, dataset=entry['key'], table=table)
+    METRICS.set('dataset_resident_bytes', datasets['resident_bytes'])
+    METRICS.sync('dataset_loads_total', datasets['loads'])
+    METRICS.sync('dataset_evictions_total', datasets['evictions'])
+
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/datasets')
+def list_datasets():
+    """列出可选择的数据集（省份/年份/批次）"""
+    province, year, batch = registry.default_key
+    datasets = registry.available()
+    etag = request_etag(datasets, registry.default_key)
+    return not_modified(etag) or cacheable(jsonify({
+        'success': True,
+        'datasets': datasets,
+        'default': {'province': province, 'year': year, 'batch': batch}
+    }), etag)
+
 @app.route('/status')
 def get_status():
     """获取系统状态"""
-    return jsonify({
-        'data_loaded': data_loaded,
-        'message': '数据已加载' if data_loaded else '请上传数据文件'
-    })
+    province, year, batch = selected_dataset_key()
+    current = registry.get((province, year, batch))
+    resident_bytes = registry.resident_bytes()
+    etag = request_etag(current.version if current is not None else None, (province, year, batch), resident_bytes)
+    response = not_modified(etag)
+    if response is not None:
+        return response
+
+    return cacheable(jsonify({
+        'data_loaded': current is not None,
+        'dataset': {'province': province, 'year': year, 'batch': batch},
+        'dataset_version': current.version if current is not None else None,
+        'memory': current.memory_report() if current is not None else None,
+        'resident_bytes': resident_bytes,
+        'message': '数据已加载' if current is not None else '请上传数据文件'
+    }), etag)
 
 if __name__ == '__main__':
     print("高考志愿规划助手启动中...")
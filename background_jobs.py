@@ -0,0 +1,243 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class JobStore:
+    """任务状态的共享存储 - SQLite，按任务ID保存状态和进度，多个worker进程都能查询其他进程提交的任务；
+    与AI回复缓存一样只是尽力而为，数据库出错时只记录日志，任务本身照常执行"""
+
+    def __init__(self, path):
+        self.path = path
+        self.enabled = True
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS jobs ('
+                    'id TEXT PRIMARY KEY, status TEXT NOT NULL, result TEXT, error TEXT, '
+                    'revision INTEGER NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)'
+                )
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs (updated_at)')
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ 任务状态存储初始化失败，任务状态只保存在本进程内: {str(e)}")
+            self.enabled = False
+
+    @contextmanager
+    def _connect(self):
+        # 每次操作使用独立连接，多线程/多进程下均可安全使用
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def save(self, job):
+        """写入任务的当前状态"""
+        if not self.enabled:
+            return
+        info = job.to_dict()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO jobs (id, status, result, error, revision, created_at, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (job.id, info['status'], json.dumps(info['result'], ensure_ascii=False, default=str),
+                     info['error'], info['revision'], job.created_at, job.updated_at)
+                )
+        except sqlite3.Error as e:
+            print(f"⚠️ 保存任务状态失败: {str(e)}")
+
+    def load(self, job_id):
+        """读取任务状态，不存在或读取失败时返回None"""
+        if not self.enabled:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT status, result, error, revision, created_at, updated_at FROM jobs WHERE id = ?', (job_id,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️ 读取任务状态失败: {str(e)}")
+            return None
+        if row is None:
+            return None
+        return {
+            'job_id': job_id, 'status': row[0], 'result': json.loads(row[1]) if row[1] else None,
+            'error': row[2], 'revision': row[3], 'created_at': row[4], 'updated_at': row[5]
+        }
+
+    def prune(self, ttl):
+        """删除超过保留时间没有更新的任务（包括所在进程已退出、不会再完成的任务）"""
+        if not self.enabled:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM jobs WHERE updated_at < ?', (time.time() - ttl,))
+        except sqlite3.Error as e:
+            print(f"⚠️ 清理任务状态失败: {str(e)}")
+
+
+class Job:
+    """后台任务状态"""
+
+    PERSIST_INTERVAL = 0.2  # 进度写入共享存储的最小间隔（秒），状态变化时立即写入
+
+    def __init__(self, job_id, store=None):
+        self.id = job_id
+        self.status = 'pending'   # pending / running / done / failed
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.revision = 0         # 每次更新加一，供等待方判断是否有新内容
+        self._store = store
+        self._persisted_at = 0.0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def update(self, **fields):
+        """更新任务字段（任务函数可用来上报进度或阶段性结果）"""
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.updated_at = time.time()
+            self.revision += 1
+            self._changed.notify_all()
+
+        # 流式生成时进度更新很频繁，写入共享存储按间隔节流
+        if self._store is not None and \
+                ('status' in fields or self.updated_at - self._persisted_at >= self.PERSIST_INTERVAL):
+            self._persisted_at = self.updated_at
+            self._store.save(self)
+
+    def wait_for_update(self, revision, timeout=None):
+        """等待任务在指定版本之后发生更新，返回最新的版本号"""
+        with self._changed:
+            if self.revision == revision and not self.finished:
+                self._changed.wait(timeout)
+            return self.revision
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'result': self.result,
+                'error': self.error,
+                'revision': self.revision
+            }
+
+
+class StoredJob(Job):
+    """其他进程提交的任务 - 状态从共享存储读取，等待更新时轮询存储"""
+
+    POLL_INTERVAL = 0.25  # 轮询共享存储的间隔（秒）
+
+    def __init__(self, store, info):
+        super().__init__(info['job_id'])
+        self._source = store
+        self._apply(info)
+
+    def _apply(self, info):
+        with self._lock:
+            self.status = info['status']
+            self.result = info['result']
+            self.error = info['error']
+            self.revision = info['revision']
+            self.created_at = info['created_at']
+            self.updated_at = info['updated_at']
+
+    def wait_for_update(self, revision, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.revision == revision and not self.finished:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            time.sleep(self.POLL_INTERVAL)
+            info = self._source.load(self.id)
+            if info is not None:
+                self._apply(info)
+        return self.revision
+
+
+class BackgroundJobs:
+    """后台任务执行器 - 有界线程池执行任务；任务状态保存在内存中，并写入共享存储（store），
+    多进程部署时任一worker都能查询到其他worker上任务的状态和进度"""
+
+    def __init__(self, max_workers=4, max_jobs=1000, ttl=3600, store=None, max_pending=0, name='background-job'):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self.max_jobs = max_jobs        # 最多保留的任务数
+        self.ttl = ttl                  # 已完成任务的保留时间（秒）
+        self.store = store              # 共享的任务状态存储，None时只保存在本进程内
+        self.max_pending = max_pending  # 最多同时排队和执行的任务数，0为不限
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, job_id=None, **kwargs):
+        """提交任务，func(job, *args, **kwargs)的返回值作为任务结果；
+        指定job_id且同名任务（包括其他进程提交的）未失败时直接复用已有任务；
+        排队和执行中的任务已达max_pending时不提交，返回None"""
+        with self._lock:
+            self._prune()
+            if job_id is not None:
+                existing = self._jobs.get(job_id)
+                if existing is not None and existing.status != 'failed':
+                    return existing.id
+                if existing is None and self.store is not None:
+                    stored = self.store.load(job_id)
+                    if stored is not None and stored['status'] != 'failed':
+                        return job_id
+            if self.max_pending and sum(not job.finished for job in self._jobs.values()) >= self.max_pending:
+                return None
+            job = Job(job_id or uuid.uuid4().hex, store=self.store)
+            self._jobs[job.id] = job
+
+        if self.store is not None:
+            self.store.save(job)
+        self.executor.submit(self._run, job, func, args, kwargs)
+        return job.id
+
+    def get(self, job_id):
+        """获取任务（本进程的任务或共享存储中其他进程的任务），不存在或已过期时返回None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None or self.store is None:
+            return job
+
+        info = self.store.load(job_id)
+        if info is None or time.time() - info['updated_at'] > self.ttl:
+            return None
+        return StoredJob(self.store, info)
+
+    def _run(self, job, func, args, kwargs):
+        job.update(status='running')
+        try:
+            job.update(status='done', result=func(job, *args, **kwargs))
+        except Exception as e:
+            job.update(status='failed', error=str(e))
+
+    def _prune(self):
+        # 清理过期的已完成任务；数量仍超限时从最早的已完成任务开始删除
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and now - job.updated_at > self.ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+        if len(self._jobs) >= self.max_jobs:
+            finished = sorted((job for job in self._jobs.values() if job.finished), key=lambda job: job.updated_at)
+            for job in finished[:len(self._jobs) - self.max_jobs + 1]:
+                del self._jobs[job.id]
+
+        if self.store is not None:
+            self.store.prune(self.ttl)
@@ -0,0 +1,187 @@
+"""合成省级规模的测试数据 - 生成一分一档表、最低分数线、招生计划三个Excel文件，
+列布局与DataProcessor.standardize_columns按位置映射的布局一致（与实际上传的文件相同）
+
+用法：
+    python benchmarks/generate_data.py --scale province --output benchmarks/data/province
+    python benchmarks/generate_data.py --candidates 300000 --groups 8000 --plan-rows 80000 --output /tmp/data
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import SCHOOLS_985, SCHOOLS_211  # noqa: E402
+
+# 预设规模：考生人数、专业组数、招生计划行数；numeric_share为最低分数线中以数字单元格存储的行的比例
+# （numeric、mixed与small的数据内容相同，只是单元格类型不同，用于覆盖数字列与文本列的合并）
+SCALES = {
+    'small': {'candidates': 50000, 'groups': 1000, 'plan_rows': 10000},
+    'numeric': {'candidates': 50000, 'groups': 1000, 'plan_rows': 10000, 'numeric_share': 1.0},
+    'mixed': {'candidates': 50000, 'groups': 1000, 'plan_rows': 10000, 'numeric_share': 0.5},
+    'medium': {'candidates': 200000, 'groups': 5000, 'plan_rows': 50000},
+    'province': {'candidates': 700000, 'groups': 20000, 'plan_rows': 200000},
+}
+
+SCORE_RANK_FILE = 'score_rank.xlsx'
+CUTOFF_FILE = 'cutoff.xlsx'
+PLAN_FILE = 'plan.xlsx'
+
+CITIES = ['北京', '上海', '天津', '重庆', '南京', '武汉', '广州', '成都', '西安', '杭州', '长沙', '济南',
+          '沈阳', '长春', '哈尔滨', '郑州', '合肥', '福州', '南昌', '昆明', '贵阳', '南宁', '桂林', '柳州']
+SCHOOL_TYPES = ['大学', '理工大学', '师范大学', '医科大学', '财经大学', '工业大学', '农业大学', '科技学院',
+                '交通大学', '外国语学院', '职业技术学院', '艺术学院']
+MAJORS = ['计算机科学与技术', '软件工程', '人工智能', '数据科学与大数据技术', '电子信息工程', '通信工程',
+          '自动化', '电气工程及其自动化', '机械设计制造及其自动化', '土木工程', '建筑学', '临床医学',
+          '口腔医学', '护理学', '药学', '汉语言文学', '英语', '法学', '经济学', '金融学', '会计学',
+          '工商管理', '市场营销', '国际经济与贸易', '数学与应用数学', '物理学', '化学', '生物科学',
+          '学前教育', '小学教育', '新闻学', '广告学', '历史学', '哲学', '社会工作', '材料科学与工程',
+          '环境工程', '食品科学与工程', '车辆工程', '网络工程', '信息安全', '物联网工程', '测绘工程',
+          '城乡规划', '风景园林', '动物医学', '农学', '旅游管理', '行政管理', '心理学']
+MAJOR_SUFFIXES = ['', '', '', '', '(师范类)', '(中外合作办学)', '(在东校区办学)', '(实验班)', '(精准专项)']
+
+
+def generate_score_rank(rng, candidates):
+    """一分一档表：说明行 + 表头(总分、人数、累计人数、名次)，分数从高到低；与实际文件一样以文本存储数字"""
+    scores = np.arange(750, 99, -1)
+    density = np.exp(-0.5 * ((scores - 470) / 95.0) ** 2)
+    counts = rng.multinomial(candidates, density / density.sum())
+    keep = counts > 0
+    scores, counts = scores[keep], counts[keep]
+    cumulative = np.cumsum(counts)
+    ranks = cumulative - counts + 1
+
+    rows = [['说明：总分=总成绩+全国性加分和地方性加分的最高分；人数、累计人数、名次统计均不包含已确定录取的考生。'],
+            ['总分', '人数', '累计人数', '名次']]
+    rows.extend([str(value) for value in row] for row in zip(scores, counts, cumulative, ranks))
+    return rows
+
+
+def generate_schools(rng, groups):
+    """院校：真实的985/211院校名称在前（覆盖院校标识），其余由城市和院校类型组合；每校若干专业组"""
+    school_count = max(1, groups // 6)
+    names = list(dict.fromkeys(SCHOOLS_985 + SCHOOLS_211))[:school_count]
+    seen = set(names)
+    while len(names) < school_count:
+        name = f"{rng.choice(CITIES)}{rng.choice(['', '第一', '第二', '东方', '城市', '工程', '应用'])}{rng.choice(SCHOOL_TYPES)}"
+        if name in seen:
+            # 组合用尽时（省级规模）以分校区区分
+            name = f"{name}({rng.choice(CITIES)}校区{len(names)})"
+        seen.add(name)
+        names.append(name)
+
+    # 院校层次决定分数线高低，名单靠前的院校层次高
+    prestige = np.sort(rng.beta(2, 5, school_count))[::-1]
+    group_school = np.sort(rng.integers(0, school_count, groups))
+    return names, prestige, group_school
+
+
+def generate_cutoff(rng, names, prestige, group_school, numeric_share=0.0, seed=2024):
+    """最低分数线：说明行 + 表头(院校代码、院校名称、专业组、投档最低分、备注)，少数专业组没有出档考生；
+    数字默认以文本存储，numeric_share比例的行改为数字单元格（由单独的随机数生成器抽取，不影响其余数据）"""
+    numeric = np.random.default_rng(seed + 1).random(len(group_school)) < numeric_share
+    rows = [['说明：表中空白处表示无出档考生。'], ['院校代码', '院校名称', '专业组', '投档最低分', '备注']]
+    group_codes = np.zeros(len(group_school), dtype=np.int64)
+    scores = np.clip(430 + prestige[group_school] * 300 + rng.normal(0, 15, len(group_school)), 200, 720).astype(int)
+    empty = rng.random(len(group_school)) < 0.02
+    previous, code = -1, 100
+    for i, school in enumerate(group_school.tolist()):
+        code = code + 1 if school == previous else 101
+        previous = school
+        group_codes[i] = code
+        cell = int if numeric[i] else str
+        rows.append([
+            cell(10000 + school), names[school], cell(code),
+            None if empty[i] else cell(scores[i]),
+            '退档' if rng.random() < 0.01 else None
+        ])
+    return rows, group_codes
+
+
+def generate_plan(rng, names, group_school, group_codes, plan_rows, year=2024):
+    """招生计划：表头(年份、学校、招生代码、学校方向、省份、科目、计划总数、专业、专业代码、批次、学费、学制、计划人数)
+    + 两个不使用的ID列；计划人数多为'3人'格式，少数为整数或'2人3人'"""
+    rows = [['年份', '学校', '招生代码', '学校方向', '省份', '科目', '计划总数', '专业', '专业代码', '批次', '学费',
+             '学制', '计划人数', 'enroll_unit_id', 'enroll_major_id']]
+    groups = len(group_school)
+    majors_per_group = rng.multinomial(max(plan_rows - groups, 0), np.full(groups, 1.0 / groups)) + 1
+    tracks = np.where(rng.random(groups) < 0.7, '物理', '历史')
+    for group in range(groups):
+        school = int(group_school[group])
+        code = int(group_codes[group])
+        counts = rng.integers(1, 9, majors_per_group[group])
+        tuition = f"{int(rng.choice([4600, 5000, 5800, 6000, 12000, 38000]))}元/年"
+        majors = rng.choice(len(MAJORS), majors_per_group[group])
+        for position, (major, count) in enumerate(zip(majors.tolist(), counts.tolist())):
+            draw = rng.random()
+            if draw < 0.9:
+                plan_count = f'{count}人'
+            elif draw < 0.97:
+                plan_count = count
+            else:
+                plan_count = f'{count}人{count + 1}人'
+            rows.append([
+                year, names[school], f'{10000 + school}[{code}]', f'{names[school]}{code}组', 'G广西',
+                tracks[group], f'{int(counts.sum())}人', MAJORS[major] + str(rng.choice(MAJOR_SUFFIXES)),
+                position + 1, '本科批', tuition, '4年', plan_count, None, None
+            ])
+    return rows
+
+
+def write_workbook(path, rows):
+    """以只写模式写出工作簿（不在内存中保留单元格对象）"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def generate(output, candidates, groups, plan_rows, seed=2024, numeric_share=0.0):
+    """生成三个Excel文件，返回{'score_rank', 'cutoff', 'plan'}文件路径；相同参数和随机种子生成相同的数据"""
+    rng = np.random.default_rng(seed)
+    os.makedirs(output, exist_ok=True)
+    paths = {
+        'score_rank': os.path.join(output, SCORE_RANK_FILE),
+        'cutoff': os.path.join(output, CUTOFF_FILE),
+        'plan': os.path.join(output, PLAN_FILE),
+    }
+
+    write_workbook(paths['score_rank'], generate_score_rank(rng, candidates))
+    names, prestige, group_school = generate_schools(rng, groups)
+    cutoff_rows, group_codes = generate_cutoff(rng, names, prestige, group_school, numeric_share, seed)
+    write_workbook(paths['cutoff'], cutoff_rows)
+    write_workbook(paths['plan'], generate_plan(rng, names, group_school, group_codes, plan_rows))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成合成的一分一档表、最低分数线和招生计划')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='预设规模')
+    parser.add_argument('--candidates', type=int, help='考生人数（覆盖预设）')
+    parser.add_argument('--groups', type=int, help='专业组数（覆盖预设）')
+    parser.add_argument('--plan-rows', type=int, help='招生计划行数（覆盖预设）')
+    parser.add_argument('--numeric-share', type=float, help='最低分数线中以数字单元格存储的行的比例（覆盖预设）')
+    parser.add_argument('--seed', type=int, default=2024, help='随机种子')
+    parser.add_argument('--output', help='输出目录，默认benchmarks/data/<规模>')
+    args = parser.parse_args()
+
+    scale = dict(SCALES[args.scale])
+    for name in ('candidates', 'groups', 'plan_rows', 'numeric_share'):
+        if getattr(args, name) is not None:
+            scale[name] = getattr(args, name)
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', args.scale)
+
+    start = time.time()
+    paths = generate(output, seed=args.seed, **scale)
+    print(f"✅ 已生成 {scale} 数据（{time.time() - start:.1f}秒）")
+    for name, path in paths.items():
+        print(f"   {name}: {path}")
+
+
+if __name__ == '__main__':
+    main()
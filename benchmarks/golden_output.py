@@ -0,0 +1,75 @@
+"""标准输出的计算 - 只依赖传入的数据处理对象和推荐器，不导入本仓库的模块，
+可以在当前代码和任一历史提交（如未优化的基准版本）上运行，得到可直接比较的结果"""
+import hashlib
+import json
+import math
+
+# 推荐查询：考生位次取考生总数的分位点，覆盖冲刺顶尖院校到保底的情况
+RANK_QUANTILES = (0.001, 0.01, 0.05, 0.2, 0.5, 0.8)
+TRACKS = ('物理', '历史')
+FILTERS = (None, {'is_985': True}, {'is_211': True, 'majors': ['计算机']}, {'majors': ['医学', '师范']})
+REC_TYPES = ('冲', '稳', '保')
+
+
+def recommendation_queries(candidates):
+    return [
+        (max(1, int(candidates * quantile)), track, filters)
+        for quantile in RANK_QUANTILES for track in TRACKS for filters in FILTERS
+    ]
+
+
+def normalize(value):
+    """取值统一为JSON基本类型：numpy标量取Python值，数值统一为保留6位小数的浮点数（5000与5000.0相同），
+    空值（None、NaN）为None，字符串去除首尾空白"""
+    if hasattr(value, 'item') and not isinstance(value, (list, dict, str)):
+        value = value.item()
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return None if isinstance(value, float) and math.isnan(value) else round(float(value), 6)
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {str(key): normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    return str(value)
+
+
+def digest(value):
+    payload = json.dumps(normalize(value), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def recommendation_digest(result, limit=50):
+    """推荐结果的摘要：每类推荐按(录取位次, 院校, 专业组, 专业)排序后计算，录取位次相同的记录之间的先后顺序不影响摘要；
+    某类推荐取满limit条时，最后一条所在的并列组（录取位次相同）哪些记录入选没有规定，只计入该位次和条数；提示消息不计入
+    （基准版本按不稳定排序取前limit条，并列记录的先后和入选本来就不确定，向量化后改为稳定排序，见user-003）"""
+    data = result.get('data') or {}
+    buckets = {}
+    for rec_type in REC_TYPES:
+        items = [normalize(item) for item in data.get(rec_type, [])]
+        boundary = None
+        if len(items) >= limit:
+            rank = items[-1].get('cutoff_rank')
+            boundary = {'cutoff_rank': rank, 'count': sum(item.get('cutoff_rank') == rank for item in items)}
+            items = [item for item in items if item.get('cutoff_rank') != rank]
+        items.sort(key=lambda item: json.dumps(
+            [item.get('cutoff_rank'), item.get('school_name'), item.get('major_group'), item.get('major_name'), item],
+            ensure_ascii=False, sort_keys=True
+        ))
+        buckets[rec_type] = {'items': items, 'boundary': boundary}
+    return digest({'success': result.get('success'), 'data': buckets})
+
+
+def golden_output(merged_df, score_to_rank, recommender, candidates):
+    """标准输出：合并行数、匹配到招生计划的行数、各推荐查询结果和整张分数转位次结果的摘要"""
+    return {
+        'merged_rows': len(merged_df),
+        'matched_rows': int(merged_df['major_name'].notna().sum()),
+        'score_to_rank': digest([score_to_rank(score) for score in range(100, 751)]),
+        'recommendations': {
+            json.dumps(query, ensure_ascii=False): recommendation_digest(recommender.generate_recommendations(*query))
+            for query in recommendation_queries(candidates)
+        },
+    }
@@ -0,0 +1,300 @@
+"""基准测试 - 在不同规模的合成数据上计时数据处理各阶段、分数转位次、筛选和推荐生成，
+结果保存为JSON以便在不同提交之间对比；另有标准输出校验，确认优化后的结果与未优化的基准版本一致
+
+标准输出由基准版本的代码生成（--golden-from）；推荐逻辑有意修改时用--update-golden和--reason
+更新，变化的条目和原因记录在标准输出文件的updates中
+
+用法：
+    python benchmarks/run_benchmarks.py --scales small,medium
+    python benchmarks/run_benchmarks.py --scales small --compare benchmarks/results/<旧提交>.json
+    python benchmarks/run_benchmarks.py --scales small --golden-from 281a87c   # 由基准版本生成标准输出
+    python benchmarks/run_benchmarks.py --scales small --update-golden --reason "说明"  # 结果有意改变时
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from generate_data import SCALES, generate  # noqa: E402
+from golden_output import golden_output, recommendation_queries  # noqa: E402
+from data_processor import DataProcessor  # noqa: E402
+from dataset import Dataset  # noqa: E402
+from recommender import Recommender  # noqa: E402
+
+DATA_DIR = os.path.join(BENCHMARK_DIR, 'data')
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+GOLDEN_DIR = os.path.join(BENCHMARK_DIR, 'golden')
+SEED = 2024
+
+SEARCH_QUERIES = ('北京', '计算机', '师范大学', '临床医学', '工程')
+
+
+def git_commit():
+    """当前提交号（工作区有改动时加-dirty）"""
+    try:
+        root = os.path.dirname(BENCHMARK_DIR)
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=root, text=True).strip()
+        dirty = subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root, text=True)
+        return commit + ('-dirty' if dirty.strip() else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def prepare_data(scale):
+    """生成（或复用已生成的）指定规模的数据文件"""
+    params = dict(SCALES[scale], seed=SEED)
+    folder = os.path.join(DATA_DIR, scale)
+    params_file = os.path.join(folder, 'params.json')
+    if os.path.exists(params_file):
+        with open(params_file, encoding='utf-8') as f:
+            if json.load(f) == params:
+                return params, {name: os.path.join(folder, filename) for name, filename in (
+                    ('score_rank', 'score_rank.xlsx'), ('cutoff', 'cutoff.xlsx'), ('plan', 'plan.xlsx'))}
+
+    print(f"🔧 生成 {scale} 规模数据: {SCALES[scale]}")
+    paths = generate(folder, seed=SEED, **SCALES[scale])
+    with open(params_file, 'w', encoding='utf-8') as f:
+        json.dump(params, f)
+    return params, paths
+
+
+def timed(func, repeat=1):
+    """执行repeat次，返回(最后一次的结果, 平均耗时秒数)；执行期间屏蔽打印输出"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = func()
+        elapsed = (time.perf_counter() - start) / repeat
+    return result, elapsed
+
+
+def benchmark_ingest(paths):
+    """计时process_all_data的每个阶段"""
+    stages = {}
+    started = {}
+
+    def progress(stage_index, total_stages, stage_name, status, message):
+        if status == 'running':
+            started[stage_name] = time.perf_counter()
+        else:
+            stages[stage_name] = round(time.perf_counter() - started[stage_name], 4)
+
+    processor = DataProcessor()
+    (success, message), elapsed = timed(
+        lambda: processor.process_all_data(paths['score_rank'], paths['cutoff'], paths['plan'], progress=progress)
+    )
+    if not success:
+        raise RuntimeError(message)
+    return processor, {'stages': stages, 'total': round(elapsed, 4)}
+
+
+def benchmark_queries(dataset, candidates, repeat):
+    """计时分数转位次、filter_data、generate_recommendations、批量推荐和联想搜索"""
+    recommender = Recommender(dataset)
+    queries = recommendation_queries(candidates)
+    scores = list(range(100, 751))
+
+    _, score_to_rank = timed(lambda: [dataset.score_to_rank(score) for score in scores], repeat)
+    _, filter_data = timed(lambda: [recommender.filter_data(*query) for query in queries], repeat)
+    _, recommend = timed(lambda: [recommender.generate_recommendations(*query) for query in queries], repeat)
+
+    students = queries * max(1, 2000 // len(queries))
+    _, batch = timed(lambda: list(recommender.generate_recommendations_batch(students)), repeat)
+    _, search = timed(lambda: [dataset.search(query) for query in SEARCH_QUERIES], repeat * 20)
+
+    return {
+        'score_to_rank_us': round(score_to_rank / len(scores) * 1e6, 3),
+        'filter_data_ms': round(filter_data / len(queries) * 1e3, 3),
+        'generate_recommendations_ms': round(recommend / len(queries) * 1e3, 3),
+        'batch_students_per_s': round(len(students) / batch, 1),
+        'search_ms': round(search / len(SEARCH_QUERIES) * 1e3, 4),
+    }
+
+
+def current_golden(dataset, candidates):
+    """当前代码的标准输出"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return golden_output(dataset.merged_df, dataset.score_to_rank, Recommender(dataset), candidates)
+
+
+# 在历史提交的代码目录中运行：该版本的DataProcessor处理数据，Recommender(数据处理对象)生成推荐
+_REVISION_GOLDEN = """
+import contextlib, io, json, os, sys
+root, benchmark_dir, paths, candidates = sys.argv[1:5]
+sys.path[:0] = [root, benchmark_dir]
+os.chdir(root)
+from data_processor import DataProcessor
+from recommender import Recommender
+from golden_output import golden_output
+paths = json.loads(paths)
+with contextlib.redirect_stdout(io.StringIO()):
+    processor = DataProcessor()
+    success, message = processor.process_all_data(paths['score_rank'], paths['cutoff'], paths['plan'])
+    if not success:
+        raise RuntimeError(message)
+    output = golden_output(processor.merged_df, processor.score_to_rank, Recommender(processor), int(candidates))
+print(json.dumps(output, ensure_ascii=False))
+"""
+
+
+def revision_golden(revision, paths, candidates):
+    """在指定提交的代码上计算标准输出（导出该提交的文件到临时目录后在子进程中运行）"""
+    root = os.path.dirname(BENCHMARK_DIR)
+    folder = tempfile.mkdtemp(prefix='golden-')
+    try:
+        archive = subprocess.run(['git', 'archive', revision], cwd=root, check=True, capture_output=True).stdout
+        subprocess.run(['tar', '-x', '-C', folder], input=archive, check=True)
+        output = subprocess.run(
+            [sys.executable, '-c', _REVISION_GOLDEN, folder, BENCHMARK_DIR, json.dumps(paths), str(candidates)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def golden_mismatches(expected, output):
+    mismatches = [key for key in ('merged_rows', 'matched_rows', 'score_to_rank') if expected.get(key) != output[key]]
+    mismatches += [query for query, value in expected['recommendations'].items()
+                   if output['recommendations'].get(query) != value]
+    return mismatches
+
+
+def save_golden(path, golden):
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(golden, f, ensure_ascii=False, indent=2)
+
+
+def check_golden(scale, params, output, update=False, reason=None):
+    """与保存的标准输出比较，返回是否一致；update时把不一致的条目更新为当前结果，并连同原因记入updates
+    （没有标准输出时以当前结果建立，来源记为当前提交）"""
+    path = os.path.join(GOLDEN_DIR, f'{scale}.json')
+    if not os.path.exists(path):
+        save_golden(path, dict(output, params=params, source=git_commit(), updates=[]))
+        print(f"💾 {scale}: 已保存标准输出 {path}（来源: 当前代码）")
+        return True
+
+    with open(path, encoding='utf-8') as f:
+        expected = json.load(f)
+    if expected.get('params') != params:
+        print(f"⚠️ {scale}: 标准输出的数据参数不同，跳过校验")
+        return True
+
+    mismatches = golden_mismatches(expected, output)
+    if mismatches and update:
+        updates = expected.get('updates', []) + [{'reason': reason, 'changed': mismatches}]
+        save_golden(path, dict(output, params=params, source=expected.get('source'), updates=updates))
+        print(f"💾 {scale}: 已更新标准输出中的{len(mismatches)}项（{reason}）")
+        return True
+    if mismatches:
+        print(f"❌ {scale}: {len(mismatches)}项结果与标准输出不一致")
+        for key in mismatches[:10]:
+            print(f"   {key}")
+        return False
+    print(f"✅ {scale}: 结果与标准输出一致（{len(expected['recommendations'])}个推荐查询）")
+    return True
+
+
+def flatten(results, prefix=''):
+    """嵌套结果展开为{'small.ingest.total': 1.2, ...}，只保留测量得到的数值（不含数据参数）"""
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}{key}'
+        if key == 'params':
+            continue
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline_path, results):
+    """打印与旧结果的对比（新/旧比值，耗时类指标大于1表示变慢）"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    old, new = flatten(baseline['scales']), flatten(results['scales'])
+    print(f"\n📊 对比 {baseline.get('commit')} -> {results['commit']}")
+    for name in sorted(set(old) & set(new)):
+        if old[name]:
+            print(f"   {name:<60} {old[name]:>12} -> {new[name]:>12}  ({new[name] / old[name]:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据处理与推荐的基准测试')
+    parser.add_argument('--scales', default='small', help=f"逗号分隔的规模：{','.join(SCALES)}")
+    parser.add_argument('--repeat', type=int, default=3, help='查询类测试的重复次数')
+    parser.add_argument('--output', help='结果JSON路径，默认benchmarks/results/<提交号>.json')
+    parser.add_argument('--compare', help='与之对比的旧结果JSON')
+    parser.add_argument('--golden-from', metavar='REVISION', help='由指定提交（如未优化的基准版本）的代码重新生成标准输出')
+    parser.add_argument('--update-golden', action='store_true', help='把与标准输出不一致的条目更新为本次结果（需要--reason）')
+    parser.add_argument('--reason', help='更新标准输出的原因，记入标准输出文件')
+    args = parser.parse_args()
+    if args.update_golden and not args.reason:
+        parser.error('--update-golden需要用--reason说明结果有意改变的原因')
+
+    results = {
+        'commit': git_commit(),
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'scales': {},
+    }
+    golden_ok = True
+    for scale in [name.strip() for name in args.scales.split(',') if name.strip()]:
+        if scale not in SCALES:
+            parser.error(f'未知规模: {scale}')
+        params, paths = prepare_data(scale)
+        if args.golden_from:
+            print(f"🔧 {scale}: 由 {args.golden_from} 生成标准输出...")
+            golden = revision_golden(args.golden_from, paths, params['candidates'])
+            save_golden(os.path.join(GOLDEN_DIR, f'{scale}.json'),
+                        dict(golden, params=params, source=args.golden_from, updates=[]))
+
+        print(f"⏱️ {scale}: 数据处理...")
+        processor, ingest = benchmark_ingest(paths)
+        dataset = Dataset.from_processor(processor)
+        print(f"⏱️ {scale}: 查询...")
+        queries = benchmark_queries(dataset, params['candidates'], args.repeat)
+
+        results['scales'][scale] = {
+            'params': params,
+            'ingest': ingest,
+            'merged_rows': len(dataset.merged_df),
+            'memory': dataset.memory_report(),
+            'queries': queries,
+        }
+        print(f"   处理 {ingest['total']}秒 {ingest['stages']}")
+        print(f"   查询 {queries}")
+        golden_ok &= check_golden(scale, params, current_golden(dataset, params['candidates']),
+                                  args.update_golden, args.reason)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"💾 结果已保存: {output}")
+
+    if args.compare:
+        compare(args.compare, results)
+    return 0 if golden_ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
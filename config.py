@@ -9,15 +9,70 @@ UPLOAD_FOLDER = 'static/uploads'
 MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
 ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
 
+# 数据集快照配置 - 上传处理后的数据保存在此目录，重启时直接加载
+SNAPSHOT_FOLDER = os.getenv(
+    'SNAPSHOT_FOLDER',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshots')
+)
+SNAPSHOT_KEEP = int(os.getenv('SNAPSHOT_KEEP', '3'))  # 保留的历史快照数量
+SNAPSHOT_CHECK_INTERVAL = float(os.getenv('SNAPSHOT_CHECK_INTERVAL', '2'))  # 多进程部署时检查新快照的间隔（秒）
+
+# 多数据集配置 - 按(省份, 年份, 批次)区分数据集，请求中未指定时使用默认值
+DEFAULT_PROVINCE = os.getenv('DEFAULT_PROVINCE', '广西')
+DEFAULT_YEAR = os.getenv('DEFAULT_YEAR', '2024')
+DEFAULT_BATCH = os.getenv('DEFAULT_BATCH', '本科')
+DATASET_MEMORY_BUDGET = int(os.getenv('DATASET_MEMORY_BUDGET', str(1024 * 1024 * 1024)))  # 常驻内存的数据集总大小上限
+
 # 推荐阈值配置
 RISK_THRESHOLD_CHONG = -0.05  # 冲线阈值 (位次差异百分比)
 RISK_THRESHOLD_WEN = 0.05     # 稳线阈值
 
+# 推荐结果缓存配置
+RECOMMEND_CACHE_MAX_ENTRIES = int(os.getenv('RECOMMEND_CACHE_MAX_ENTRIES', '2048'))          # 最多缓存的查询数
+RECOMMEND_CACHE_MAX_BYTES = int(os.getenv('RECOMMEND_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))  # 缓存内存上限
+RECOMMEND_CACHE_RANK_BUCKET = int(os.getenv('RECOMMEND_CACHE_RANK_BUCKET', '0'))             # 位次分桶宽度，0为精确位次
+
+# 批量推荐（POST /recommend_batch）单次最多的考生数
+MAX_BATCH_RECOMMEND_STUDENTS = int(os.getenv('MAX_BATCH_RECOMMEND_STUDENTS', '5000'))
+
+# 调试输出（推荐筛选的逐步行数、位次分布、冲稳保分布，数据处理各阶段的列名、数据预览和阶段结果）只对按该比例抽样的请求或处理过程打印和计算，0为关闭，1为每次都输出
+DEBUG_SAMPLE_RATE = float(os.getenv('DEBUG_SAMPLE_RATE', '0'))
+
+# HTTP缓存配置：只读接口的响应带有由数据集版本和请求计算的ETag，浏览器和反向代理可用If-None-Match重新验证
+HTTP_CACHE_MAX_AGE = int(os.getenv('HTTP_CACHE_MAX_AGE', '0'))  # 无需重新验证即可直接使用的秒数，0为每次都重新验证
+
+# 后台任务配置（AI策略生成等耗时任务）
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', '4'))        # 后台线程数
+BACKGROUND_JOB_TTL = int(os.getenv('BACKGROUND_JOB_TTL', '3600'))     # 已完成任务的保留时间（秒）
+# AI策略生成使用单独的线程池，与数据处理互不排队；排队的策略任务超过上限时本次不生成策略
+STRATEGY_WORKERS = int(os.getenv('STRATEGY_WORKERS', '4'))            # 策略生成线程数
+STRATEGY_MAX_PENDING = int(os.getenv('STRATEGY_MAX_PENDING', '32'))   # 最多排队和执行的策略任务数
+# 任务状态和进度的共享存储，多进程部署时任一worker都能查询上传进度和AI策略
+JOB_STORE_PATH = os.getenv(
+    'JOB_STORE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'background_jobs.sqlite3')
+)
+
 # DeepSeek API 配置 - 使用环境变量保护API密钥
 DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY', '')  # 从环境变量获取，如果没有则为空
 DEEPSEEK_BASE_URL = os.getenv('DEEPSEEK_BASE_URL', 'https://api.deepseek.com')
 DEEPSEEK_MODEL = os.getenv('DEEPSEEK_MODEL', 'deepseek-chat')  # 或者使用 "deepseek-reasoner" 来使用R1模型
 
+# AI并发与限流配置 - 批量专业分析时使用
+DEEPSEEK_MAX_CONCURRENCY = int(os.getenv('DEEPSEEK_MAX_CONCURRENCY', '8'))  # 同时进行的API请求数
+DEEPSEEK_RATE_LIMIT = float(os.getenv('DEEPSEEK_RATE_LIMIT', '5'))          # 每秒最多发出的请求数，0为不限
+DEEPSEEK_RATE_BURST = int(os.getenv('DEEPSEEK_RATE_BURST', '10'))           # 允许的突发请求数
+MAX_BATCH_ANALYSIS_ITEMS = 200                                               # 单次批量分析的最大条目数
+
+# AI回复缓存配置 - 相同提示词的回复保存在本地SQLite中
+DEEPSEEK_CACHE_ENABLED = os.getenv('DEEPSEEK_CACHE_ENABLED', '1') == '1'  # 设为0关闭缓存
+DEEPSEEK_CACHE_PATH = os.getenv(
+    'DEEPSEEK_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'deepseek_responses.sqlite3')
+)
+DEEPSEEK_CACHE_TTL = int(os.getenv('DEEPSEEK_CACHE_TTL', str(7 * 24 * 3600)))              # 过期时间（秒）
+DEEPSEEK_CACHE_MAX_BYTES = int(os.getenv('DEEPSEEK_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))  # 缓存容量上限
+
 # 985院校列表
 SCHOOLS_985 = [
     '北京大学', '清华大学', '复旦大学', '上海交通大学', '浙江大学', '南京大学',
@@ -1,6 +1,35 @@
 import pandas as pd
+import numpy as np
+from pandas.errors import EmptyDataError
+from pandas.io.parsers import TextParser
 import os
-from config import SCHOOLS_985, SCHOOLS_211
+import random
+import time
+import uuid
+from config import SCHOOLS_985, SCHOOLS_211, DEBUG_SAMPLE_RATE
+from score_rank_table import ScoreRankTable
+from recommendation_index import RecommendationIndex
+from school_labeler import SchoolLabeler, pack_school_flags
+from search_index import SearchIndex
+from metrics import METRICS
+
+# 985/211名单只编译一次
+SCHOOL_LABELER = SchoolLabeler(SCHOOLS_985, SCHOOLS_211)
+
+# 压缩内存时转为分类类型的文本列（取值重复多）和尝试降低精度的数值列
+CATEGORY_COLUMNS = ('school_code', 'school_name', 'track', 'batch', 'tuition')
+DOWNCAST_COLUMNS = ('cutoff_score', 'cutoff_rank', 'plan_count')
+
+def debug_sampled():
+    """是否输出调试信息 - 按DEBUG_SAMPLE_RATE抽样，与推荐筛选的调试输出使用同一开关"""
+    return DEBUG_SAMPLE_RATE > 0 and random.random() < DEBUG_SAMPLE_RATE
+
+
+def new_dataset_version():
+    """生成数据集版本号（精确到微秒的时间戳加随机后缀，按字典序即可比较先后）"""
+    now = time.time()
+    return time.strftime('%Y%m%d%H%M%S', time.localtime(now)) + f'{int(now % 1 * 1e6):06d}-' + uuid.uuid4().hex[:8]
+
 
 class DataProcessor:
     def __init__(self):
@@ -8,18 +37,35 @@ class DataProcessor:
         self.cutoff_df = None          # 最低分数线
         self.plan_df = None            # 招生计划
         self.merged_df = None          # 合并后的数据
+        self.score_rank_table = None   # 编译后的一分一档查找表
+        self.recommendation_index = None  # 按科目分区、按位次排序的推荐索引
+        self.search_index = None       # 院校/专业联想搜索索引
+        self.dataset_version = None    # 数据集版本号，每次成功处理数据后更新
+        self.debug = False             # 本次处理是否输出各阶段的调试信息（列名、数据预览、阶段结果）
         
+    def debug_print(self, *args):
+        """调试输出 - 只在抽样到的处理过程中打印；警告和失败信息不经过这里，总是打印"""
+        if self.debug:
+            print(*args)
+
     def load_excel_files(self, score_rank_file, cutoff_file, plan_file):
         """加载三个Excel文件"""
         try:
-            # 先检查一分一档表的实际结构
-            print("🔍 检查一分一档表结构...")
-            
-            # 尝试读取前几行来确定数据起始位置
-            preview_df = pd.read_excel(score_rank_file, nrows=10)
-            print(f"预览前10行列名: {list(preview_df.columns)}")
-            print(f"预览数据:")
-            print(preview_df.head())
+            self.score_rank_table = None
+            self.recommendation_index = None
+            self.search_index = None
+
+            # 每个工作簿只打开一次：一分一档表整表读取一遍原始单元格，
+            # 表头识别和各种读取策略都在内存中的原始行上完成
+            self.debug_print("🔍 检查一分一档表结构...")
+            with pd.ExcelFile(score_rank_file) as book:
+                rows = self._read_raw_rows(book, 0)
+
+            # 预览前10行（与直接读取时的表头和数据一致）
+            preview_df = self._frame_from_rows(rows[:11])
+            self.debug_print(f"预览前10行列名: {list(preview_df.columns)}")
+            self.debug_print(f"预览数据:")
+            self.debug_print(preview_df.head())
             
             # 查找包含"总分"和"位次/名次"的行作为真正的表头
             header_row = None
@@ -27,57 +73,47 @@ class DataProcessor:
                 row_values = preview_df.iloc[i].astype(str).tolist()
                 if any('总分' in str(val) for val in row_values) and any(any(keyword in str(val) for keyword in ['位次', '名次', 'rank']) for val in row_values):
                     header_row = i + 1  # pandas的行索引从0开始，但Excel从1开始
-                    print(f"找到真正的表头在第{header_row + 1}行")
+                    self.debug_print(f"找到真正的表头在第{header_row + 1}行")
                     break
             
-            # 根据找到的表头位置读取完整数据
+            # 根据找到的表头位置构建完整数据
             if header_row is not None:
-                self.score_rank_df = pd.read_excel(score_rank_file, header=header_row)
+                self.score_rank_df = self._frame_from_rows(rows, header=header_row)
             else:
                 # 如果没找到，尝试不同的读取策略
-                print("未找到明确表头，尝试多种读取方式...")
+                self.debug_print("未找到明确表头，尝试多种读取方式...")
                 try:
                     # 策略1：跳过第一行
-                    self.score_rank_df = pd.read_excel(score_rank_file, skiprows=1)
+                    self.score_rank_df = self._frame_from_rows(rows, skiprows=1)
                     if len(self.score_rank_df) < 1000:
                         # 策略2：直接读取
-                        self.score_rank_df = pd.read_excel(score_rank_file)
+                        self.score_rank_df = self._frame_from_rows(rows)
                         if len(self.score_rank_df) < 1000:
                             # 策略3：指定具体列
-                            self.score_rank_df = pd.read_excel(score_rank_file, usecols=[0, 1, 2, 3])
+                            self.score_rank_df = self._frame_from_rows(rows, usecols=[0, 1, 2, 3])
                 except:
-                    self.score_rank_df = pd.read_excel(score_rank_file)
+                    self.score_rank_df = self._frame_from_rows(rows)
             
-            print(f"✅ 一分一档表最终加载：{len(self.score_rank_df)}行，列名：{list(self.score_rank_df.columns)}")
+            self.debug_print(f"✅ 一分一档表最终加载：{len(self.score_rank_df)}行，列名：{list(self.score_rank_df.columns)}")
             
-            # 读取最低分数线 - 尝试多个sheet名称
-            sheet_names = ['投档线', 'Sheet1', 0]  # 多个可能的sheet名称
+            # 读取最低分数线 - 按工作簿中已有的sheet名称选择，只读取一次
             self.cutoff_df = None
-            
-            for sheet_name in sheet_names:
-                try:
-                    self.cutoff_df = pd.read_excel(cutoff_file, sheet_name=sheet_name)
-                    print(f"✅ 最低分数线从sheet '{sheet_name}' 加载成功，共{len(self.cutoff_df)}行")
-                    break
-                except Exception as e:
-                    print(f"尝试sheet '{sheet_name}' 失败: {e}")
-                    continue
+            with pd.ExcelFile(cutoff_file) as book:
+                sheet_name = self._resolve_sheet(book, ['投档线', 'Sheet1', 0])
+                if sheet_name is not None:
+                    self.cutoff_df = book.parse(sheet_name)
+                    self.debug_print(f"✅ 最低分数线从sheet '{sheet_name}' 加载成功，共{len(self.cutoff_df)}行")
             
             if self.cutoff_df is None:
                 return False, "无法读取最低分数线文件"
             
-            # 读取招生计划 - 尝试多个sheet名称  
-            sheet_names = ['计划', 'Sheet1', 0]
+            # 读取招生计划 - 按工作簿中已有的sheet名称选择，只读取一次
             self.plan_df = None
-            
-            for sheet_name in sheet_names:
-                try:
-                    self.plan_df = pd.read_excel(plan_file, sheet_name=sheet_name)
-                    print(f"✅ 招生计划从sheet '{sheet_name}' 加载成功，共{len(self.plan_df)}行")
-                    break
-                except Exception as e:
-                    print(f"尝试sheet '{sheet_name}' 失败: {e}")
-                    continue
+            with pd.ExcelFile(plan_file) as book:
+                sheet_name = self._resolve_sheet(book, ['计划', 'Sheet1', 0])
+                if sheet_name is not None:
+                    self.plan_df = book.parse(sheet_name)
+                    self.debug_print(f"✅ 招生计划从sheet '{sheet_name}' 加载成功，共{len(self.plan_df)}行")
             
             if self.plan_df is None:
                 return False, "无法读取招生计划文件"
@@ -86,13 +122,40 @@ class DataProcessor:
         except Exception as e:
             return False, f"文件加载失败: {str(e)}"
     
+    def _resolve_sheet(self, book, candidates):
+        """从工作簿的sheet列表中选出第一个存在的候选sheet（整数表示按位置）"""
+        for candidate in candidates:
+            if isinstance(candidate, int):
+                if candidate < len(book.sheet_names):
+                    return candidate
+            elif candidate in book.sheet_names:
+                return candidate
+            self.debug_print(f"sheet '{candidate}' 不存在，尝试下一个")
+        return None
+
+    @staticmethod
+    def _read_raw_rows(book, sheet_name):
+        """读取sheet的原始单元格行（不识别表头、不转换类型，空单元格为空字符串）"""
+        raw_df = book.parse(sheet_name, header=None, dtype=object, na_filter=False)
+        return raw_df.values.tolist()
+
+    @staticmethod
+    def _frame_from_rows(rows, **kwargs):
+        """按read_excel的解析规则把原始行构建为DataFrame，支持header/skiprows/usecols等参数"""
+        if not rows:
+            return pd.DataFrame()
+        try:
+            return TextParser([list(row) for row in rows], skip_blank_lines=False, **kwargs).read()
+        except EmptyDataError:
+            return pd.DataFrame()
+
     def standardize_columns(self):
         """标准化列名 - 根据实际数据结构"""
         try:
             # 显示原始列名用于调试
-            print(f"一分一档表原始列名: {list(self.score_rank_df.columns)}")
-            print(f"最低分数线原始列名: {list(self.cutoff_df.columns)}")
-            print(f"招生计划原始列名: {list(self.plan_df.columns)}")
+            self.debug_print(f"一分一档表原始列名: {list(self.score_rank_df.columns)}")
+            self.debug_print(f"最低分数线原始列名: {list(self.cutoff_df.columns)}")
+            self.debug_print(f"招生计划原始列名: {list(self.plan_df.columns)}")
 
             # 一分一档表列名标准化
             # 实际结构：总分、人数、累计人数、名次
@@ -148,62 +211,77 @@ class DataProcessor:
             # 应用列名映射
             if self.score_rank_df is not None and score_rank_columns:
                 self.score_rank_df.rename(columns=score_rank_columns, inplace=True)
-                print(f"一分一档表标准化后列名: {list(self.score_rank_df.columns)}")
+                self.debug_print(f"一分一档表标准化后列名: {list(self.score_rank_df.columns)}")
 
             if self.cutoff_df is not None and cutoff_columns:
                 self.cutoff_df.rename(columns=cutoff_columns, inplace=True)
-                print(f"最低分数线标准化后列名: {list(self.cutoff_df.columns)}")
+                self.debug_print(f"最低分数线标准化后列名: {list(self.cutoff_df.columns)}")
 
             if self.plan_df is not None and plan_columns:
                 self.plan_df.rename(columns=plan_columns, inplace=True)
-                print(f"招生计划标准化后列名: {list(self.plan_df.columns)}")
+                self.debug_print(f"招生计划标准化后列名: {list(self.plan_df.columns)}")
 
                 # 清理计划人数数据
                 if 'plan_count' in self.plan_df.columns:
-                    self.plan_df['plan_count'] = self.plan_df['plan_count'].apply(self.clean_plan_count)
-                    print("计划人数数据清理完成")
+                    self.plan_df['plan_count'], unparseable = self.clean_plan_counts(self.plan_df['plan_count'])
+                    if unparseable:
+                        print(f"警告：{unparseable}个计划人数无法解析，已设为0")
+                    self.debug_print("计划人数数据清理完成")
 
-            print("列名标准化完成")
+            self.debug_print("列名标准化完成")
             return True, "列名标准化成功"
         except Exception as e:
             return False, f"列名标准化失败: {str(e)}"
 
     def clean_plan_count(self, plan_count_str):
-        """清理计划人数数据，处理类似'3人3人4人'的字符串"""
-        try:
-            if pd.isna(plan_count_str):
-                return 0
-
-            # 转换为字符串
-            plan_str = str(plan_count_str).strip()
-
-            # 如果已经是纯数字，直接返回
-            if plan_str.isdigit():
-                return int(plan_str)
-
-            # 处理包含"人"字的情况，如"3人"、"3人4人5人"
-            if '人' in plan_str:
-                # 提取所有数字
-                import re
-                numbers = re.findall(r'\d+', plan_str)
-                if numbers:
-                    # 如果有多个数字，求和（如"3人4人5人" -> 3+4+5=12）
-                    total = sum(int(num) for num in numbers)
-                    return total
-                else:
-                    return 0
-
-            # 尝试直接转换为整数
-            try:
-                return int(float(plan_str))
-            except:
-                # 如果都失败了，返回0
-                print(f"警告：无法解析计划人数 '{plan_str}'，设为0")
-                return 0
-
-        except Exception as e:
-            print(f"清理计划人数时出错: {e}, 原始值: {plan_count_str}")
-            return 0
+        """清理单个计划人数，规则同clean_plan_counts"""
+        counts, _ = self.clean_plan_counts(pd.Series([plan_count_str], dtype=object))
+        return int(counts.iloc[0])
+
+    @staticmethod
+    def clean_plan_counts(values):
+        """整列清理计划人数，处理类似'3人4人5人'的字符串（求和为12）；
+        返回(整数列, 无法解析的数量)，空值和无法解析的值记为0"""
+        values = pd.Series(values, dtype=object)
+        missing = values.isna().to_numpy()
+
+        # 计划表中取值重复度很高，先对去重后的取值做向量化解析，再按编码展开到整列
+        codes, uniques = pd.factorize(values.astype(str).str.strip())
+        text = pd.Series(uniques, dtype=object)
+        parsed = np.zeros(len(text), dtype=np.int64)
+        failed = np.zeros(len(text), dtype=bool)
+        pending = np.ones(len(text), dtype=bool)
+
+        # 纯数字（最常见的情况）
+        digits = text.str.fullmatch(r'[0-9]+').to_numpy(dtype=bool)
+        parsed[digits] = pd.to_numeric(text[digits]).to_numpy(dtype=np.int64)
+        pending &= ~digits
+
+        # 包含"人"字：提取所有数字求和，没有数字时为0
+        people = pending & text.str.contains('人', regex=False).to_numpy(dtype=bool)
+        if people.any():
+            numbers = text[people].str.extractall(r'(\d+)')[0]
+            if len(numbers):
+                sums = numbers.map(int).groupby(level=0).sum()
+                parsed[sums.index.to_numpy()] = sums.to_numpy(dtype=np.int64)
+        pending &= ~people
+
+        # 其余按数值解析（如'3.0'），取整数部分；格式特殊的少数取值逐个解析
+        if pending.any():
+            numeric = pd.to_numeric(text[pending], errors='coerce').to_numpy(dtype=np.float64)
+            finite = np.isfinite(numeric)
+            positions = np.flatnonzero(pending)
+            parsed[positions[finite]] = np.trunc(numeric[finite]).astype(np.int64)
+            for position in positions[~finite]:
+                try:
+                    parsed[position] = int(float(text.iat[position]))
+                except (ValueError, OverflowError):
+                    failed[position] = True
+
+        counts = parsed[codes]
+        counts[missing] = 0
+        unparseable = int((failed[codes] & ~missing).sum())
+        return pd.Series(counts, index=values.index), unparseable
     
     def sanity_check_rank_data(self):
         """一分一档表数据自检（Must-Run Sanity Check）"""
@@ -231,8 +309,8 @@ class DataProcessor:
             row_cnt = len(df_rank)
             valid_cnt = len(valid_ranks)
 
-            print(f"✅ 已载入一分一档表，共 {row_cnt} 行，有效位次数据 {valid_cnt} 行")
-            print(f"📊 位次范围: {min_rank} – {max_rank}")
+            self.debug_print(f"✅ 已载入一分一档表，共 {row_cnt} 行，有效位次数据 {valid_cnt} 行")
+            self.debug_print(f"📊 位次范围: {min_rank} – {max_rank}")
 
             # 数据完整性检查 - 放宽标准，因为可能是部分数据
             if max_rank < 1000:
@@ -241,54 +319,75 @@ class DataProcessor:
                 # 不返回错误，继续处理
 
             # 显示数据样本用于验证
-            print("📊 数据样本检查：")
+            self.debug_print("📊 数据样本检查：")
             if 'total_score' in df_rank.columns:
-                print("前3行数据：")
-                print(df_rank[['total_score', 'rank']].head(3))
-                print("后3行数据：")
-                print(df_rank[['total_score', 'rank']].tail(3))
+                self.debug_print("前3行数据：")
+                self.debug_print(df_rank[['total_score', 'rank']].head(3))
+                self.debug_print("后3行数据：")
+                self.debug_print(df_rank[['total_score', 'rank']].tail(3))
             else:
-                print("前3行rank数据：")
-                print(df_rank['rank'].head(3))
-                print("后3行rank数据：")
-                print(df_rank['rank'].tail(3))
+                self.debug_print("前3行rank数据：")
+                self.debug_print(df_rank['rank'].head(3))
+                self.debug_print("后3行rank数据：")
+                self.debug_print(df_rank['rank'].tail(3))
 
             return True, f"一分一档表数据检查通过（{valid_cnt}行有效数据，位次{min_rank}-{max_rank}）"
 
         except Exception as e:
             return False, f"数据自检失败: {str(e)}"
     
+    def compile_score_rank_table(self):
+        """编译一分一档表为有序数组，供分数/位次双向二分查找"""
+        try:
+            if self.score_rank_df is None:
+                return False, "一分一档表未正确加载"
+
+            self.score_rank_table = ScoreRankTable.from_dataframe(self.score_rank_df)
+            if len(self.score_rank_table) == 0:
+                return False, "一分一档表没有有效数据"
+
+            return True, f"一分一档查找表编译完成，共{len(self.score_rank_table)}个分数"
+        except Exception as e:
+            return False, f"一分一档查找表编译失败: {str(e)}"
+
+    def get_score_rank_table(self):
+        """获取编译后的一分一档查找表，未编译时即时编译"""
+        if self.score_rank_table is None and self.score_rank_df is not None:
+            self.score_rank_table = ScoreRankTable.from_dataframe(self.score_rank_df)
+        return self.score_rank_table
+
+    def get_recommendation_index(self):
+        """获取推荐索引，未构建时即时构建"""
+        if self.recommendation_index is None and self.merged_df is not None:
+            self.recommendation_index = RecommendationIndex(self.merged_df)
+        return self.recommendation_index
+
+    def get_search_index(self):
+        """获取联想搜索索引（中间表已释放时为None，由Dataset从合并数据构建）"""
+        return self.search_index
+
+    def scores_to_ranks(self, scores):
+        """批量分数转位次（数组输入，数组输出，无对应位次为NaN）"""
+        table = self.get_score_rank_table()
+        if table is None:
+            return np.full(np.shape(scores), np.nan)
+        return table.scores_to_ranks(scores)
+
     def score_to_rank(self, score, track='物理'):
         """分数转位次 - 根据实际一分一档表结构"""
         try:
-            # 根据一分一档表查找对应位次
-            if self.score_rank_df is None:
+            table = self.get_score_rank_table()
+            if table is None:
                 return None
 
-            # 清理数据，确保分数和位次都是数值
-            df = self.score_rank_df.copy()
-            df = df.dropna(subset=['total_score', 'rank'])
-            df['total_score'] = pd.to_numeric(df['total_score'], errors='coerce')
-            df['rank'] = pd.to_numeric(df['rank'], errors='coerce')
-            df = df.dropna(subset=['total_score', 'rank'])
-
-            if len(df) == 0:
+            if len(table) == 0:
                 print("一分一档表没有有效数据")
                 return None
 
-            # 查找小于等于目标分数的最高分数对应的位次
-            filtered_df = df[df['total_score'] <= score].sort_values('total_score', ascending=False)
-
-            if len(filtered_df) > 0:
-                rank = int(filtered_df.iloc[0]['rank'])
+            rank = table.score_to_rank(score)
+            if rank is not None and debug_sampled():
                 print(f"分数{score}对应位次: {rank}")
-                return rank
-            else:
-                # 如果分数太高，返回最高分对应的位次
-                max_score_row = df.loc[df['total_score'].idxmax()]
-                rank = int(max_score_row['rank'])
-                print(f"分数{score}超出范围，返回最高分{max_score_row['total_score']}对应位次: {rank}")
-                return rank
+            return rank
         except Exception as e:
             print(f"分数转位次失败: {str(e)}")
             return None
@@ -297,37 +396,34 @@ class DataProcessor:
         """为最低分数线添加位次信息"""
         try:
             # 调试信息：显示当前列名
-            print(f"最低分数线表当前列名: {list(self.cutoff_df.columns)}")
+            self.debug_print(f"最低分数线表当前列名: {list(self.cutoff_df.columns)}")
 
             # 检查是否已有cutoff_rank列且有数据
             if 'cutoff_rank' in self.cutoff_df.columns:
                 # 检查cutoff_rank列是否有有效数据
                 valid_ranks = self.cutoff_df['cutoff_rank'].dropna()
                 if len(valid_ranks) > 0:
-                    print(f"已有位次数据 {len(valid_ranks)} 条，跳过位次转换")
+                    self.debug_print(f"已有位次数据 {len(valid_ranks)} 条，跳过位次转换")
                     return True, "位次数据已存在"
 
             # 如果没有位次数据但有分数数据，则进行转换
             if 'cutoff_score' in self.cutoff_df.columns:
-                print("开始分数转位次转换...")
+                self.debug_print("开始分数转位次转换...")
 
                 # 清理分数数据
                 self.cutoff_df['cutoff_score'] = pd.to_numeric(self.cutoff_df['cutoff_score'], errors='coerce')
 
-                # 转换分数为位次
-                def convert_score_to_rank(score):
-                    if pd.isna(score):
-                        return None
-                    try:
-                        return self.score_to_rank(int(score))
-                    except:
-                        return None
+                # 编译一分一档查找表，整列批量转换（分数先取整，与逐行int()一致）
+                success, message = self.compile_score_rank_table()
+                if not success:
+                    return False, message
 
-                self.cutoff_df['cutoff_rank'] = self.cutoff_df['cutoff_score'].apply(convert_score_to_rank)
+                scores = self.cutoff_df['cutoff_score'].to_numpy(dtype=np.float64)
+                self.cutoff_df['cutoff_rank'] = self.scores_to_ranks(np.trunc(scores))
 
                 # 统计转换结果
                 valid_conversions = self.cutoff_df['cutoff_rank'].dropna()
-                print(f"成功转换 {len(valid_conversions)} 条分数为位次")
+                self.debug_print(f"成功转换 {len(valid_conversions)} 条分数为位次")
 
                 return True, f"位次转换成功，共转换{len(valid_conversions)}条记录"
             else:
@@ -339,93 +435,138 @@ class DataProcessor:
     def add_school_labels(self):
         """添加985/211标识"""
         try:
-            def get_school_labels(school_name):
-                is_985 = any(school in str(school_name) for school in SCHOOLS_985)
-                is_211 = any(school in str(school_name) for school in SCHOOLS_211)
-                return is_985, is_211
+            # 为最低分数线数据添加标识（按不同校名匹配后映射回每一行）
+            is_985, is_211 = SCHOOL_LABELER.label(self.cutoff_df['school_name'])
+            self.cutoff_df['is_985'] = is_985
+            self.cutoff_df['is_211'] = is_211
             
-            # 为最低分数线数据添加标识
-            labels = self.cutoff_df['school_name'].apply(get_school_labels)
-            self.cutoff_df['is_985'] = [label[0] for label in labels]
-            self.cutoff_df['is_211'] = [label[1] for label in labels]
-            
-            print("院校标识添加完成")
+            self.debug_print("院校标识添加完成")
             return True, "院校标识添加成功"
         except Exception as e:
             return False, f"院校标识添加失败: {str(e)}"
     
+    def ensure_numeric_plan_count(self):
+        """确保计划人数是数值列（标准化时已清理的直接使用，不再重复转换）"""
+        if not pd.api.types.is_numeric_dtype(self.plan_df['plan_count']):
+            self.plan_df['plan_count'] = pd.to_numeric(self.plan_df['plan_count'], errors='coerce').fillna(0)
+
+    def encode_join_key(self, cutoff_column, plan_column):
+        """按招生计划中的取值把两张表的合并键字典编码为同一套整数编码，返回(最低分数线编码, 招生计划编码, 取值表)；
+        空值和招生计划中没有的取值编码为-1，任一表缺少该列时返回None"""
+        if cutoff_column not in self.cutoff_df.columns or plan_column not in self.plan_df.columns:
+            return None
+        plan_codes, uniques = pd.factorize(self.join_key_values(self.plan_df[plan_column]))
+        cutoff_codes = pd.Index(uniques).get_indexer(self.join_key_values(self.cutoff_df[cutoff_column]))
+        return cutoff_codes.astype(np.int32), plan_codes.astype(np.int32), uniques
+
+    @staticmethod
+    def join_key_values(values):
+        """合并键统一为去除首尾空白的字符串：Excel中以数字存储的101、101.0与文本'101'视为同一个键，
+        空值和空字符串返回None（只转换不重复的取值）"""
+        def normalize(value):
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)
+            return str(value).strip() or None
+
+        codes, uniques = pd.factorize(values)
+        normalized = pd.Series([normalize(value) for value in uniques], dtype=object)
+        return normalized.reindex(codes).to_numpy()
+
+    def join_plan(self, cutoff_keys, plan_keys, separator, limit, aggregations):
+        """按整数键聚合招生计划并左连接到最低分数线数据：每组专业名称按出现顺序去重，
+        取前limit个用separator拼接；其余列按aggregations聚合（均为内置聚合，不逐组调用Python函数）"""
+        grouped = self.plan_df.groupby(plan_keys, sort=True)[list(aggregations)].agg(aggregations)
+        grouped = grouped[grouped.index >= 0]
+
+        # 专业名称同样编码为整数：按(组, 专业)去重后保持组内出现顺序取前limit个，
+        # 再对组内连续排列的字符串做分段求和完成拼接
+        name_codes, name_values = pd.factorize(self.plan_df['major_name'])
+        name_codes = name_codes.astype(np.int32)
+        rows = np.flatnonzero((plan_keys >= 0) & (name_codes >= 0))
+        _, first = np.unique(plan_keys[rows] * np.int64(len(name_values)) + name_codes[rows], return_index=True)
+        rows = rows[np.sort(first)]
+        rows = rows[np.argsort(plan_keys[rows], kind='stable')]
+        keys, name_codes = plan_keys[rows], name_codes[rows]
+
+        major_names = pd.Series(dtype=object)
+        if len(keys):
+            group_keys, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+            name_codes = name_codes[np.arange(len(keys)) - np.repeat(starts, counts) < limit]
+            counts = np.minimum(counts, limit)
+            pieces = (separator + pd.Index(name_values).astype(str)).to_numpy(dtype=object)
+            joined = np.add.reduceat(pieces[name_codes], np.r_[0, np.cumsum(counts)[:-1]])
+            major_names = pd.Series([value[len(separator):] for value in joined], index=group_keys, dtype=object)
+        grouped.insert(0, 'major_name', major_names.reindex(grouped.index).to_numpy())
+
+        # 左连接：按键查找分组位置，没有对应计划的行填充空值
+        positions = grouped.index.get_indexer(cutoff_keys)
+        left = self.cutoff_df.reset_index(drop=True)
+        right = grouped.reset_index(drop=True).reindex(positions).reset_index(drop=True)
+        overlap = left.columns.intersection(right.columns)
+        if len(overlap):
+            left = left.rename(columns={name: f'{name}_x' for name in overlap})
+            right = right.rename(columns={name: f'{name}_y' for name in overlap})
+        return pd.concat([left, right], axis=1)
+
     def merge_data(self):
         """合并数据 - 根据实际数据结构"""
         try:
-            # 首先为最低分数线数据添加985/211标识
-            self.add_school_labels()
+            # 流水线中已添加过985/211标识时不再重复计算
+            if 'is_985' not in self.cutoff_df.columns or 'is_211' not in self.cutoff_df.columns:
+                self.add_school_labels()
 
             # 从招生代码中提取专业组信息进行匹配
             # 招生代码格式如：10003[102] -> 专业组为102
             if 'admission_code' in self.plan_df.columns:
-                self.plan_df['extracted_major_group'] = self.plan_df['admission_code'].str.extract(r'\[(\d+)\]')
+                # 同一专业组的招生代码重复出现，只对不重复的代码做提取
+                codes, uniques = pd.factorize(self.plan_df['admission_code'])
+                extracted = pd.Series(uniques, dtype=object).str.extract(r'\[(\d+)\]', expand=False)
+                self.plan_df['extracted_major_group'] = extracted.reindex(codes).to_numpy()
+
+            # 学校名称和专业组只编码一次，两种合并策略都按整数键连接
+            schools = self.encode_join_key('school_name', 'school_name')
+            groups = self.encode_join_key('major_group', 'extracted_major_group')
 
             # 尝试多种合并策略
             merge_success = False
 
             # 策略1：通过专业组合并
-            if 'major_group' in self.cutoff_df.columns and 'extracted_major_group' in self.plan_df.columns:
+            if groups is not None and schools is not None:
                 try:
                     # 准备招生计划数据用于合并
-                    # 确保plan_count是数值类型
-                    self.plan_df['plan_count_numeric'] = pd.to_numeric(self.plan_df['plan_count'], errors='coerce').fillna(0)
+                    self.ensure_numeric_plan_count()
+
+                    # 学校+专业组组合为一个整数键，任一部分为空时不参与合并
+                    group_count = max(len(groups[2]), 1)
+                    cutoff_keys = np.where((schools[0] >= 0) & (groups[0] >= 0), schools[0] * np.int64(group_count) + groups[0], -1)
+                    plan_keys = np.where((schools[1] >= 0) & (groups[1] >= 0), schools[1] * np.int64(group_count) + groups[1], -1)
+                    if not (cutoff_keys >= 0).any():
+                        raise ValueError("没有最低分数线记录能按学校+专业组匹配到招生计划")
 
                     # 改进：保留更多专业详情，不过度聚合
-                    plan_for_merge = self.plan_df.groupby(['school_name', 'extracted_major_group']).agg({
-                        'major_name': lambda x: ' | '.join(x.unique()[:10]),  # 保留更多专业名称
+                    self.merged_df = self.join_plan(cutoff_keys, plan_keys, ' | ', 10, {
                         'track': 'first',                                     # 取第一个科目
-                        'plan_count_numeric': 'sum',                          # 计划人数求和
+                        'plan_count': 'sum',                                  # 计划人数求和
                         'batch': 'first',                                     # 批次信息
                         'tuition': 'first'                                    # 学费信息
-                    }).reset_index()
-
-                    # 重命名回plan_count
-                    plan_for_merge.rename(columns={'plan_count_numeric': 'plan_count'}, inplace=True)
-
-                    # 重命名列以匹配
-                    plan_for_merge.rename(columns={'extracted_major_group': 'major_group'}, inplace=True)
-
-                    self.merged_df = pd.merge(
-                        self.cutoff_df,
-                        plan_for_merge,
-                        on=['school_name', 'major_group'],
-                        how='left'
-                    )
+                    })
                     merge_success = True
-                    print(f"数据合并完成（按学校+专业组），共{len(self.merged_df)}行")
+                    self.debug_print(f"数据合并完成（按学校+专业组），共{len(self.merged_df)}行")
                 except Exception as e:
                     print(f"专业组合并失败: {e}")
 
             # 策略2：如果专业组合并失败，尝试按学校名称合并
-            if not merge_success and 'school_name' in self.cutoff_df.columns and 'school_name' in self.plan_df.columns:
+            if not merge_success and schools is not None:
                 try:
                     # 准备招生计划数据用于合并（按学校聚合）
-                    # 确保plan_count是数值类型
-                    if 'plan_count_numeric' not in self.plan_df.columns:
-                        self.plan_df['plan_count_numeric'] = pd.to_numeric(self.plan_df['plan_count'], errors='coerce').fillna(0)
+                    self.ensure_numeric_plan_count()
 
-                    plan_for_merge = self.plan_df.groupby('school_name').agg({
-                        'major_name': lambda x: ', '.join(x.unique()[:5]),  # 取前5个专业
+                    self.merged_df = self.join_plan(schools[0], schools[1], ', ', 5, {
                         'track': 'first',                                   # 取第一个科目
-                        'plan_count_numeric': 'sum'                         # 计划人数求和
-                    }).reset_index()
-
-                    # 重命名回plan_count
-                    plan_for_merge.rename(columns={'plan_count_numeric': 'plan_count'}, inplace=True)
-
-                    self.merged_df = pd.merge(
-                        self.cutoff_df,
-                        plan_for_merge,
-                        on='school_name',
-                        how='left'
-                    )
+                        'plan_count': 'sum'                                 # 计划人数求和
+                    })
                     merge_success = True
-                    print(f"数据合并完成（按学校名称），共{len(self.merged_df)}行")
+                    self.debug_print(f"数据合并完成（按学校名称），共{len(self.merged_df)}行")
                 except Exception as e:
                     print(f"学校名称合并失败: {e}")
 
@@ -436,7 +577,7 @@ class DataProcessor:
                 self.merged_df['major_name'] = '未知专业'
                 self.merged_df['track'] = '物理'  # 默认物理
                 self.merged_df['plan_count'] = 0
-                print(f"使用最低分数线数据（无合并），共{len(self.merged_df)}行")
+                self.debug_print(f"使用最低分数线数据（无合并），共{len(self.merged_df)}行")
 
             # 确保必要的列存在
             required_columns = ['school_name', 'major_group', 'cutoff_score', 'cutoff_rank', 'is_985', 'is_211']
@@ -447,28 +588,120 @@ class DataProcessor:
                     else:
                         self.merged_df[col] = None
 
-            print(f"最终合并数据列名: {list(self.merged_df.columns)}")
+            # 合并数据已变化，推荐索引在压缩内存后重新构建
+            self.recommendation_index = None
+
+            self.debug_print(f"最终合并数据列名: {list(self.merged_df.columns)}")
             return True, "数据合并成功"
         except Exception as e:
             return False, f"数据合并失败: {str(e)}"
     
-    def process_all_data(self, score_rank_file, cutoff_file, plan_file):
-        """处理所有数据的主函数"""
+    def build_search_index(self):
+        """构建联想搜索索引：专业取招生计划中的单个专业名称，院校取最低分数线中的院校名称（须在释放中间表之前）"""
+        try:
+            self.search_index = SearchIndex.from_tables(self.plan_df, self.cutoff_df)
+            return True, f"搜索索引构建完成，共{len(self.search_index)}个名称"
+        except Exception as e:
+            return False, f"搜索索引构建失败: {str(e)}"
+
+    def compact_tables(self):
+        """压缩内存：释放合并后不再需要的中间表，合并数据改用紧凑的列类型，然后构建推荐索引"""
+        try:
+            before = sum(self.memory_report().values())
+
+            # 一分一档表编译为查找表后不再需要原表，最低分数线和招生计划已合并进merged_df
+            self.get_score_rank_table()
+            self.score_rank_df = None
+            self.cutoff_df = None
+            self.plan_df = None
+
+            self.merged_df = self.compact_frame(self.merged_df)
+
+            # 构建推荐索引，推荐请求只在索引上做二分查找
+            self.recommendation_index = RecommendationIndex(self.merged_df)
+
+            after = sum(self.memory_report().values())
+            return True, f"内存占用 {before / 1024 / 1024:.1f}MB -> {after / 1024 / 1024:.1f}MB"
+        except Exception as e:
+            return False, f"内存压缩失败: {str(e)}"
+
+    @staticmethod
+    def compact_frame(df):
+        """紧凑的列类型：学校、科目、批次、学费转为分类，分数、位次、计划人数在不损失精度时降为
+        较小的整数（有空值时为float32），985/211标识按位压缩为school_flags列"""
+        columns = {}
+        for name in df.columns:
+            values = df[name]
+            if name in ('is_985', 'is_211'):
+                if 'school_flags' not in columns:
+                    columns['school_flags'] = pack_school_flags(
+                        df['is_985'] if 'is_985' in df.columns else np.zeros(len(df), dtype=bool),
+                        df['is_211'] if 'is_211' in df.columns else np.zeros(len(df), dtype=bool)
+                    )
+                continue
+            if name in CATEGORY_COLUMNS and values.dtype == object:
+                values = values.astype('category')
+            elif name in DOWNCAST_COLUMNS and pd.api.types.is_numeric_dtype(values.dtype) \
+                    and not pd.api.types.is_bool_dtype(values.dtype):
+                values = DataProcessor.downcast_numbers(values)
+            columns[name] = values
+        return pd.DataFrame(columns, index=df.index)
+
+    @staticmethod
+    def downcast_numbers(values):
+        """数值列降低精度：全为整数且无空值时取能容纳的最小整数类型，否则在float32能精确表示时转为float32"""
+        numbers = values.to_numpy(dtype=np.float64)
+        missing = np.isnan(numbers)
+        if not missing.any() and np.array_equal(numbers, np.trunc(numbers)):
+            return pd.to_numeric(values, downcast='integer')
+        narrow = numbers.astype(np.float32)
+        if np.array_equal(narrow[~missing], numbers[~missing]):
+            return pd.Series(narrow, index=values.index, name=values.name)
+        return values
+
+    def memory_report(self):
+        """各表占用内存（字节），已释放的表不计入"""
+        tables = {
+            'score_rank_df': self.score_rank_df,
+            'cutoff_df': self.cutoff_df,
+            'plan_df': self.plan_df,
+            'merged_df': self.merged_df
+        }
+        return {
+            name: int(df.memory_usage(index=True, deep=True).sum())
+            for name, df in tables.items() if df is not None
+        }
+
+    def process_all_data(self, score_rank_file, cutoff_file, plan_file, progress=None, version=None):
+        """处理所有数据的主函数；progress(阶段序号, 阶段总数, 阶段名称, 状态, 消息)用于上报进度；
+        version为处理结果的数据集版本号（如上传时生成，按上传先后排序），默认在处理完成时生成；
+        各阶段的调试输出按DEBUG_SAMPLE_RATE对整次处理抽样，阶段耗时和结果只记入指标"""
+        self.debug = debug_sampled()
         steps = [
             ("加载文件", lambda: self.load_excel_files(score_rank_file, cutoff_file, plan_file)),
             ("标准化列名", self.standardize_columns),
             ("数据自检", self.sanity_check_rank_data),
             ("位次转换", self.add_cutoff_rank),
             ("添加院校标识", self.add_school_labels),
-            ("合并数据", self.merge_data)
+            ("合并数据", self.merge_data),
+            ("构建搜索索引", self.build_search_index),
+            ("压缩内存", self.compact_tables)
         ]
         
-        for step_name, step_func in steps:
-            success, message = step_func()
+        for step_index, (step_name, step_func) in enumerate(steps, 1):
+            if progress is not None:
+                progress(step_index, len(steps), step_name, 'running', '')
+            with METRICS.timer('ingest_stage_seconds', stage=step_name):
+                success, message = step_func()
+            if progress is not None:
+                progress(step_index, len(steps), step_name, 'done' if success else 'failed', message)
             if not success:
+                METRICS.inc('ingest_runs_total', result='failed')
                 return False, f"{step_name}失败: {message}"
-            print(f"✓ {step_name}: {message}")
+            self.debug_print(f"✓ {step_name}: {message}")
         
+        METRICS.inc('ingest_runs_total', result='success')
+        self.dataset_version = version or new_dataset_version()
         return True, "所有数据处理完成"
     
     def get_available_cities(self):
@@ -511,6 +744,17 @@ class DataProcessor:
             if not success:
                 return False, f"数据合并失败: {message}"
 
+            # 6. 构建搜索索引
+            success, message = self.build_search_index()
+            if not success:
+                return False, f"搜索索引构建失败: {message}"
+
+            # 7. 压缩内存
+            success, message = self.compact_tables()
+            if not success:
+                return False, f"内存压缩失败: {message}"
+
+            self.dataset_version = new_dataset_version()
             return True, "数据处理完成"
 
         except Exception as e:
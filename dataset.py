@@ -0,0 +1,132 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from recommendation_index import RecommendationIndex
+from major_index import MAJOR_SEPARATOR
+from search_index import SearchIndex
+
+
+class Dataset:
+    """只读数据集 - 一次数据处理的最终结果（合并数据、一分一档查找表、推荐索引、搜索索引），
+    构建后不再修改，可在多个线程间共享；更新数据时整体替换为新的Dataset"""
+
+    def __init__(self, version, merged_df, score_rank_table, recommendation_index=None, search_index=None):
+        self._version = version
+        self._merged_df = merged_df
+        self._score_rank_table = score_rank_table
+        self._recommendation_index = recommendation_index if recommendation_index is not None \
+            else RecommendationIndex(merged_df)
+        self._search_index = search_index
+        self._search_lock = threading.Lock()
+        self._created_at = time.time()
+        self._memory_report = None
+
+        # 筛选项目录只计算一次
+        self._cities = self._catalog('city')
+        self._majors = self._catalog('major_name')
+
+    @classmethod
+    def from_processor(cls, processor):
+        """从处理完成的DataProcessor构建数据集"""
+        return cls(
+            processor.dataset_version,
+            processor.merged_df,
+            processor.get_score_rank_table(),
+            processor.get_recommendation_index(),
+            processor.get_search_index()
+        )
+
+    def _catalog(self, column):
+        if self._merged_df is not None and column in self._merged_df.columns:
+            return tuple(sorted(self._merged_df[column].dropna().unique().tolist()))
+        return ()
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def dataset_version(self):
+        return self._version
+
+    @property
+    def merged_df(self):
+        return self._merged_df
+
+    @property
+    def created_at(self):
+        return self._created_at
+
+    def memory_usage(self):
+        """数据集占用内存的估算（字节），内存映射的数据同样计入"""
+        return self.memory_report()['total']
+
+    def memory_report(self):
+        """各部分占用内存（字节）：合并数据、一分一档查找表、推荐索引、搜索索引及合计"""
+        if self._memory_report is None:
+            report = {'merged_df': 0, 'score_rank_table': 0, 'recommendation_index': 0, 'search_index': 0}
+            if self._merged_df is not None:
+                report['merged_df'] = int(self._merged_df.memory_usage(index=True, deep=True).sum())
+            table = self._score_rank_table
+            if table is not None:
+                report['score_rank_table'] = sum(np.asarray(array).nbytes for array in (
+                    table.scores, table.ranks, table.rank_keys, table.key_scores, table.key_positions
+                ))
+            for ranks, positions in self._recommendation_index.partitions().values():
+                report['recommendation_index'] += ranks.nbytes + positions.nbytes
+            if self._search_index is not None:
+                report['search_index'] = self._search_index.memory_usage()
+            report['total'] = sum(report.values())
+            self._memory_report = report
+        return dict(self._memory_report)
+
+    def get_score_rank_table(self):
+        return self._score_rank_table
+
+    def get_recommendation_index(self):
+        return self._recommendation_index
+
+    def get_search_index(self):
+        """联想搜索索引；数据集由旧快照加载、没有保存搜索索引时，首次使用时从合并数据构建"""
+        if self._search_index is None:
+            with self._search_lock:
+                if self._search_index is None:
+                    self._search_index = self._build_search_index()
+                    self._memory_report = None
+        return self._search_index
+
+    def _build_search_index(self):
+        df = self._merged_df
+        if df is None:
+            return SearchIndex([], [], [])
+        majors = pd.DataFrame({
+            'major_name': df['major_name'].dropna().astype(str).str.split(MAJOR_SEPARATOR, regex=False).explode()
+        }) if 'major_name' in df.columns else None
+        return SearchIndex.from_tables(majors, df)
+
+    def search(self, query, kind=None, limit=10):
+        """院校/专业联想搜索"""
+        return self.get_search_index().search(query, kind, limit)
+
+    def get_available_cities(self):
+        """获取可用城市列表"""
+        return list(self._cities)
+
+    def get_available_majors(self):
+        """获取可用专业类别列表"""
+        return list(self._majors)
+
+    def scores_to_ranks(self, scores):
+        """批量分数转位次，查不到的分数为NaN"""
+        if self._score_rank_table is None:
+            return np.full(np.shape(scores), np.nan)
+        return self._score_rank_table.scores_to_ranks(scores)
+
+    def score_to_rank(self, score, track='物理'):
+        """分数转位次"""
+        if self._score_rank_table is None or len(self._score_rank_table) == 0:
+            return None
+        return self._score_rank_table.score_to_rank(score)
@@ -0,0 +1,190 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from dataset_snapshot import DatasetSnapshotStore
+
+
+class DatasetRegistry:
+    """数据集注册表 - 按(省份, 年份, 批次)管理多个数据集；首次查询时从快照懒加载，
+    常驻内存按最近使用顺序在内存预算内淘汰，被淘汰的数据集下次查询时重新挂载"""
+
+    MAX_MISSING = 1024  # 记住的不存在的数据集键的数量上限
+
+    def __init__(self, folder, memory_budget=1024 * 1024 * 1024, default_key=('广西', '2024', '本科'),
+                 keep=3, check_interval=2.0):
+        self.folder = folder
+        self.memory_budget = memory_budget    # 常驻数据集的内存预算（字节）
+        self.default_key = default_key
+        self.keep = keep                      # 每个数据集保留的历史快照数量
+        self.check_interval = check_interval  # 检查其他进程是否发布了新快照的间隔（秒）
+
+        self._resident = OrderedDict()        # key -> Dataset
+        self._checked_at = {}                 # key -> 上次检查快照版本的时间
+        self._seen = {}                       # key -> 上次看到的快照版本指针
+        self._lock = threading.RLock()
+        self._load_locks = {}                 # key -> 挂载快照的锁
+        self._publish_locks = {}              # key -> 发布的锁
+        self._missing = OrderedDict()         # key -> 上次确认没有快照目录的时间（有界）
+        self.loads = 0
+        self.evictions = 0
+
+    def normalize_key(self, province=None, year=None, batch=None):
+        """补全缺省的选择项，得到数据集键"""
+        default_province, default_year, default_batch = self.default_key
+        return (
+            str(province or default_province).strip(),
+            str(year or default_year).strip(),
+            str(batch or default_batch).strip()
+        )
+
+    def store(self, key):
+        """数据集对应的快照存储，每个键一个子目录"""
+        name = '_'.join(re.sub(r'[\\/:*?"<>|_\s]+', '-', part) for part in key)
+        return DatasetSnapshotStore(os.path.join(self.folder, name), keep=self.keep)
+
+    def get(self, key):
+        """获取数据集；未加载时从快照挂载，其他进程发布了新版本时重新挂载；没有数据时返回None
+        （读取快照指针和挂载快照不持有注册表锁，加载一个数据集不阻塞其他数据集的查询）"""
+        with self._lock:
+            dataset = self._resident.get(key)
+            if dataset is not None:
+                self._resident.move_to_end(key)
+                if time.monotonic() - self._checked_at.get(key, 0) < self.check_interval:
+                    return dataset
+            elif time.monotonic() - self._missing.get(key, float('-inf')) < self.check_interval:
+                return None
+
+        # 没有快照目录的键（如请求中任意填写的省份）不建立按键的状态，只在有界的集合中记住一段时间
+        store = self.store(key)
+        if dataset is None and not os.path.isdir(store.folder):
+            with self._lock:
+                self._missing[key] = time.monotonic()
+                self._missing.move_to_end(key)
+                while len(self._missing) > self.MAX_MISSING:
+                    self._missing.popitem(last=False)
+            return None
+
+        with self._key_lock(self._load_locks, key):
+            # 等待期间其他线程可能已检查或挂载过
+            with self._lock:
+                dataset = self._resident.get(key)
+                if dataset is not None and time.monotonic() - self._checked_at.get(key, 0) < self.check_interval:
+                    return dataset
+                seen = self._seen.get(key)
+
+            # 只在快照版本指针变化时挂载（本进程刚发布、快照尚未写完时不会被旧快照覆盖）
+            latest = store.latest_version()
+            with self._lock:
+                self._checked_at[key] = time.monotonic()
+                if latest is None or latest == seen:
+                    return dataset
+                self._seen[key] = latest
+            if dataset is not None and dataset.version >= latest:
+                return dataset
+
+            loaded, message = store.load_latest()
+            print(f"{'🔄' if loaded is not None else '⚠️'} {'/'.join(key)}: {message}")
+            if loaded is None:
+                return dataset
+
+            with self._lock:
+                # 挂载期间本进程发布了新数据集时保留新发布的
+                current = self._resident.get(key)
+                if current is not None and current is not dataset:
+                    return current
+                self.loads += 1
+                self._put(key, loaded)
+            return loaded
+
+    def publish(self, key, dataset):
+        """发布新处理的数据集：立即替换常驻版本，保存快照后改用内存映射的快照；
+        同一数据集的发布依次进行，版本早于已发布版本的处理结果（较早的上传较晚处理完）不发布；
+        返回(是否发布, 是否保存快照, 消息)"""
+        store = self.store(key)
+        with self._key_lock(self._publish_locks, key):
+            with self._lock:
+                current = self._resident.get(key)
+            newest = max(filter(None, [current.version if current is not None else None, store.latest_version()]),
+                         default=None)
+            if newest is not None and newest > dataset.version:
+                return False, False, f"已有更新的数据集版本{newest}，本次处理结果{dataset.version}未发布"
+
+            with self._lock:
+                self._put(key, dataset)
+
+            success, message = store.save(dataset)
+            if success:
+                mapped, _ = store.load_latest()
+                with self._lock:
+                    if mapped is not None and mapped.version == dataset.version \
+                            and self._resident.get(key) is dataset:
+                        self._put(key, mapped)
+                    self._seen[key] = dataset.version
+            return True, success, message
+
+    def _key_lock(self, locks, key):
+        # 每个数据集各自的锁（加载、发布分别串行化）
+        with self._lock:
+            return locks.setdefault(key, threading.Lock())
+
+    def _put(self, key, dataset):
+        # 放入常驻集合，超出内存预算时从最久未使用的数据集开始淘汰；
+        # 刚放入的和没有对应快照的（未安装pyarrow或保存失败）不淘汰，否则淘汰后无法重新加载
+        self._resident[key] = dataset
+        self._resident.move_to_end(key)
+        self._missing.pop(key, None)
+        for evicted_key in list(self._resident)[:-1]:
+            if self.resident_bytes() <= self.memory_budget:
+                break
+            if self._resident[evicted_key].version != self._seen.get(evicted_key):
+                continue
+            del self._resident[evicted_key]
+            self._checked_at.pop(evicted_key, None)
+            self._seen.pop(evicted_key, None)
+            self.evictions += 1
+            print(f"♻️ 数据集 {'/'.join(evicted_key)} 超出内存预算，已从内存中移除")
+
+    def resident_bytes(self):
+        with self._lock:
+            return sum(dataset.memory_usage() for dataset in self._resident.values())
+
+    def available(self):
+        """所有可用的数据集（磁盘上已有快照或已在内存中）"""
+        keys = set()
+        if os.path.isdir(self.folder):
+            for name in os.listdir(self.folder):
+                parts = name.split('_')
+                if len(parts) == 3 and os.path.isfile(os.path.join(self.folder, name, DatasetSnapshotStore.LATEST_FILE)):
+                    keys.add(tuple(parts))
+        with self._lock:
+            resident = list(self._resident)
+        keys.update(resident)
+
+        return [
+            {
+                'province': key[0],
+                'year': key[1],
+                'batch': key[2],
+                'loaded': key in resident
+            }
+            for key in sorted(keys)
+        ]
+
+    def stats(self):
+        """注册表统计"""
+        with self._lock:
+            return {
+                'resident': [
+                    {'key': '/'.join(key), 'version': dataset.version, 'bytes': dataset.memory_usage(),
+                     'rows': len(dataset.merged_df) if dataset.merged_df is not None else 0,
+                     'tables': dataset.memory_report()}
+                    for key, dataset in self._resident.items()
+                ],
+                'resident_bytes': self.resident_bytes(),
+                'memory_budget': self.memory_budget,
+                'loads': self.loads,
+                'evictions': self.evictions
+            }
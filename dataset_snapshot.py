@@ -0,0 +1,294 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from score_rank_table import ScoreRankTable
+from dataset import Dataset
+from recommendation_index import RecommendationIndex
+from major_index import MajorIndex
+from search_index import SearchIndex
+
+try:
+    import pyarrow as pa
+except ImportError:  # 未安装pyarrow时不保存/加载快照，其余功能不受影响
+    pa = None
+
+
+class DatasetSnapshotStore:
+    """处理后数据集的快照存储 - 每个版本一个目录，保存为Arrow IPC文件，加载时内存映射；
+    数值列和字符串列的编码直接引用映射区域，多个进程加载同一快照时共享同一份物理内存"""
+
+    FORMAT = 2
+    MERGED_FILE = 'merged.arrow'
+    DICTIONARIES_FILE = 'dictionaries.arrow'
+    INDEX_FILE = 'index.arrow'
+    MAJOR_TOKENS_FILE = 'major_tokens.arrow'
+    MAJOR_ROWS_FILE = 'major_rows.arrow'
+    SEARCH_FILE = 'search.arrow'
+    SCORE_TO_RANK_FILE = 'score_to_rank.arrow'
+    RANK_TO_SCORE_FILE = 'rank_to_score.arrow'
+    METADATA_FILE = 'metadata.json'
+    LATEST_FILE = 'LATEST'
+
+    def __init__(self, folder, keep=3):
+        self.folder = folder
+        self.keep = keep  # 保留的历史快照数量
+
+    @property
+    def available(self):
+        return pa is not None
+
+    def latest_version(self):
+        """最新快照的版本号，没有快照时返回None"""
+        try:
+            with open(os.path.join(self.folder, self.LATEST_FILE), encoding='utf-8') as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def save(self, dataset):
+        """保存数据集；先写入临时目录再改名，最后原子替换LATEST指针"""
+        if not self.available:
+            return False, "未安装pyarrow，跳过快照保存"
+        if dataset.merged_df is None or dataset.version is None:
+            return False, "没有可保存的数据"
+
+        try:
+            version = dataset.version
+            table = dataset.get_score_rank_table()
+            os.makedirs(self.folder, exist_ok=True)
+
+            path = os.path.join(self.folder, version)
+            tmp_path = path + '.tmp'
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+
+            # 保存推荐索引使用的数据（位次列已转为数值），索引分区数组一并保存，加载时无需重新排序
+            index = dataset.get_recommendation_index()
+            merged, dictionaries = self._frame_to_arrow(index.frame)
+            self._write_table(os.path.join(tmp_path, self.MERGED_FILE), merged)
+            self._write_table(os.path.join(tmp_path, self.DICTIONARIES_FILE), dictionaries)
+
+            index_partitions = []
+            ranks, positions = [], []
+            offset = 0
+            for track, (partition_ranks, partition_positions) in index.partitions().items():
+                index_partitions.append([track, offset, offset + len(partition_ranks)])
+                ranks.append(partition_ranks)
+                positions.append(np.asarray(partition_positions, dtype=np.int64))
+                offset += len(partition_ranks)
+            self._write_table(os.path.join(tmp_path, self.INDEX_FILE), pa.table({
+                'rank': np.concatenate(ranks).astype(np.float64),
+                'position': np.concatenate(positions)
+            }))
+
+            # 专业倒排索引：专业名称及其行号段，行号数组加载时直接引用映射内存
+            majors = index.majors
+            if majors is not None:
+                self._write_table(os.path.join(tmp_path, self.MAJOR_TOKENS_FILE), pa.table({
+                    'token': pa.array(list(majors.tokens), type=pa.string()),
+                    'start': np.asarray(majors.starts[:-1], dtype=np.int64),
+                    'stop': np.asarray(majors.starts[1:], dtype=np.int64)
+                }))
+                self._write_table(os.path.join(tmp_path, self.MAJOR_ROWS_FILE), pa.table({
+                    'row': np.asarray(majors.rows, dtype=np.int64)
+                }))
+
+            # 联想搜索的名称和热度，加载时重建n-gram倒排表
+            search = dataset.get_search_index()
+            self._write_table(os.path.join(tmp_path, self.SEARCH_FILE), pa.table({
+                'kind': pa.array(list(search.kinds), type=pa.string()),
+                'name': pa.array(list(search.names), type=pa.string()),
+                'weight': np.asarray(search.weights, dtype=np.int64)
+            }))
+
+            self._write_table(os.path.join(tmp_path, self.SCORE_TO_RANK_FILE), pa.table({
+                'scores': table.scores,
+                'ranks': table.ranks
+            }))
+            self._write_table(os.path.join(tmp_path, self.RANK_TO_SCORE_FILE), pa.table({
+                'rank_keys': table.rank_keys,
+                'key_scores': table.key_scores,
+                'key_positions': np.asarray(table.key_positions, dtype=np.int64)
+            }))
+
+            metadata = {
+                'format': self.FORMAT,
+                'version': version,
+                'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'merged_rows': len(index.frame),
+                'merged_columns': list(map(str, index.frame.columns)),
+                'categorical_columns': sorted(set(dictionaries.column('column').to_pylist())),
+                'score_rank_rows': len(table),
+                'index_partitions': index_partitions,
+                'major_index': majors is not None,
+                'search_index': True
+            }
+            with open(os.path.join(tmp_path, self.METADATA_FILE), 'w', encoding='utf-8') as f:
+                json.dump(metadata, f, ensure_ascii=False, indent=2)
+
+            shutil.rmtree(path, ignore_errors=True)
+            os.rename(tmp_path, path)
+            self._write_latest(version)
+            self._prune(version)
+            return True, f"快照已保存: {version}"
+        except Exception as e:
+            return False, f"快照保存失败: {str(e)}"
+
+    def load_latest(self):
+        """加载最新快照，返回(Dataset, 消息)，失败时Dataset为None"""
+        if not self.available:
+            return None, "未安装pyarrow，无法加载快照"
+
+        version = self.latest_version()
+        if version is None:
+            return None, "没有可用的数据快照"
+
+        try:
+            path = os.path.join(self.folder, version)
+            with open(os.path.join(path, self.METADATA_FILE), encoding='utf-8') as f:
+                metadata = json.load(f)
+            if metadata.get('format') != self.FORMAT:
+                return None, f"快照 {version} 格式已过期，请重新上传数据"
+
+            merged_df = self._arrow_to_frame(
+                self._read_table(os.path.join(path, self.MERGED_FILE)),
+                self._read_table(os.path.join(path, self.DICTIONARIES_FILE)),
+                metadata['categorical_columns']
+            )
+            score_to_rank = self._read_table(os.path.join(path, self.SCORE_TO_RANK_FILE))
+            rank_to_score = self._read_table(os.path.join(path, self.RANK_TO_SCORE_FILE))
+
+            # 查找数组直接引用内存映射的缓冲区，不复制
+            table = ScoreRankTable(
+                self._column(score_to_rank, 'scores'),
+                self._column(score_to_rank, 'ranks'),
+                self._column(rank_to_score, 'rank_keys'),
+                self._column(rank_to_score, 'key_scores'),
+                self._column(rank_to_score, 'key_positions')
+            )
+
+            # 推荐索引的分区数组同样直接引用映射内存
+            index_table = self._read_table(os.path.join(path, self.INDEX_FILE))
+            index_ranks = self._column(index_table, 'rank')
+            index_positions = self._column(index_table, 'position')
+            partitions = {
+                track: (index_ranks[start:stop], index_positions[start:stop])
+                for track, start, stop in metadata['index_partitions']
+            }
+
+            # 专业倒排索引（较早的快照没有保存时在加载后重新构建）
+            majors = None
+            if metadata.get('major_index'):
+                tokens = self._read_table(os.path.join(path, self.MAJOR_TOKENS_FILE))
+                stops = self._column(tokens, 'stop')
+                majors = MajorIndex(
+                    tokens.column('token').to_numpy(zero_copy_only=False),
+                    np.r_[self._column(tokens, 'start'), stops[-1:] if len(stops) else [0]].astype(np.int64),
+                    self._column(self._read_table(os.path.join(path, self.MAJOR_ROWS_FILE)), 'row')
+                )
+
+            # 联想搜索索引（较早的快照没有保存时由数据集在首次搜索时构建）
+            search = None
+            if metadata.get('search_index'):
+                entries = self._read_table(os.path.join(path, self.SEARCH_FILE))
+                search = SearchIndex(
+                    entries.column('kind').to_pylist(),
+                    entries.column('name').to_pylist(),
+                    self._column(entries, 'weight')
+                )
+
+            dataset = Dataset(
+                metadata['version'], merged_df, table, RecommendationIndex(merged_df, partitions, majors), search
+            )
+            return dataset, f"已加载数据快照 {version}（{len(merged_df)} 条记录）"
+        except Exception as e:
+            return None, f"快照加载失败: {str(e)}"
+
+    @staticmethod
+    def _frame_to_arrow(df):
+        """DataFrame转Arrow表：数值列原样保存（NaN不转为null，加载时可零拷贝），
+        文本等其他列保存为分类编码（-1表示空值），类别取值另存为(列名, 取值)的字典表"""
+        columns = {}
+        dictionary_columns = []
+        dictionary_values = []
+        for name in df.columns:
+            values = df[name]
+            if pd.api.types.is_numeric_dtype(values.dtype) and not isinstance(values.dtype, pd.CategoricalDtype):
+                columns[str(name)] = pa.array(values.to_numpy())
+                continue
+
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                # 混合类型的列统一转为字符串（空值保持为空）
+                if not values.dropna().map(type).eq(str).all():
+                    values = values.where(values.isna(), values.astype(str))
+                values = values.astype('category')
+            categories = values.cat.categories.astype(str)
+
+            columns[str(name)] = pa.array(values.cat.codes.to_numpy())
+            dictionary_columns.extend([str(name)] * len(categories))
+            dictionary_values.extend(categories.tolist())
+
+        dictionaries = pa.table({
+            'column': pa.array(dictionary_columns, type=pa.string()),
+            'value': pa.array(dictionary_values, type=pa.string())
+        })
+        return pa.table(columns), dictionaries
+
+    @classmethod
+    def _arrow_to_frame(cls, table, dictionaries, categorical_columns):
+        """Arrow表转DataFrame：数值列和分类编码直接引用映射内存，只有类别取值在本进程中创建"""
+        names = dictionaries.column('column').to_numpy(zero_copy_only=False)
+        values = dictionaries.column('value').to_numpy(zero_copy_only=False)
+
+        data = {}
+        for name in table.column_names:
+            array = cls._column(table, name)
+            if name in categorical_columns:
+                categories = pd.Index(values[names == name], dtype=object)
+                data[name] = pd.Categorical.from_codes(array, categories=categories)
+            else:
+                data[name] = array
+        return pd.DataFrame(data, copy=False)
+
+    @staticmethod
+    def _column(table, name):
+        # 单块且无空值的数值列直接引用映射内存；布尔列按位存储，需要展开为数组
+        column = table.column(name)
+        if column.num_chunks == 1:
+            return column.chunk(0).to_numpy(zero_copy_only=False)
+        return column.to_numpy()
+
+    @staticmethod
+    def _write_table(path, table):
+        with pa.OSFile(path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    @staticmethod
+    def _read_table(path):
+        # 读出的表引用映射区域，映射在表被释放前保持有效
+        return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+    def _write_latest(self, version):
+        tmp_file = os.path.join(self.folder, self.LATEST_FILE + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, os.path.join(self.folder, self.LATEST_FILE))
+
+    def _prune(self, current):
+        # 按版本号（时间戳开头）保留最近的若干个快照
+        versions = sorted(
+            name for name in os.listdir(self.folder)
+            if os.path.isdir(os.path.join(self.folder, name)) and not name.endswith('.tmp')
+        )
+        for name in versions[:-self.keep] if self.keep > 0 else []:
+            if name != current:
+                shutil.rmtree(os.path.join(self.folder, name), ignore_errors=True)
@@ -1,18 +1,80 @@
 from openai import OpenAI
-from config import DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL, DEEPSEEK_MODEL
+from config import (
+    DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL, DEEPSEEK_MODEL,
+    DEEPSEEK_CACHE_ENABLED, DEEPSEEK_CACHE_PATH, DEEPSEEK_CACHE_TTL, DEEPSEEK_CACHE_MAX_BYTES,
+    DEEPSEEK_MAX_CONCURRENCY, DEEPSEEK_RATE_LIMIT, DEEPSEEK_RATE_BURST
+)
+from response_cache import ResponseCache
+from rate_limiter import TokenBucket
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
 
 class DeepSeekService:
-    def __init__(self):
+    def __init__(self, cache=None):
         self.client = OpenAI(
             api_key=DEEPSEEK_API_KEY,
             base_url=DEEPSEEK_BASE_URL
         )
+        # AI回复缓存：相同模型、提示词和温度的请求直接返回已生成的内容
+        self.cache = cache if cache is not None else ResponseCache(
+            DEEPSEEK_CACHE_PATH,
+            ttl=DEEPSEEK_CACHE_TTL,
+            max_bytes=DEEPSEEK_CACHE_MAX_BYTES,
+            enabled=DEEPSEEK_CACHE_ENABLED
+        )
+        # 批量分析共用的有界线程池和令牌桶限流（只限制实际发出的API请求）
+        self.executor = ThreadPoolExecutor(max_workers=DEEPSEEK_MAX_CONCURRENCY, thread_name_prefix='deepseek')
+        self.rate_limiter = TokenBucket(DEEPSEEK_RATE_LIMIT, DEEPSEEK_RATE_BURST) if DEEPSEEK_RATE_LIMIT > 0 else None
+
+    def _chat(self, messages, temperature):
+        """调用对话接口，优先读取持久化缓存"""
+        key = self.cache.make_key(DEEPSEEK_MODEL, messages, temperature)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        response = self.client.chat.completions.create(
+            model=DEEPSEEK_MODEL,
+            messages=messages,
+            stream=False,
+            temperature=temperature
+        )
+        content = response.choices[0].message.content
+        self.cache.set(key, content)
+        return content
+
+    def _chat_stream(self, messages, temperature):
+        """流式调用对话接口，收到一段就产出一段；完整生成后写入缓存，命中缓存时一次性产出"""
+        key = self.cache.make_key(DEEPSEEK_MODEL, messages, temperature)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        response = self.client.chat.completions.create(
+            model=DEEPSEEK_MODEL,
+            messages=messages,
+            stream=True,
+            temperature=temperature
+        )
+        parts = []
+        for chunk in response:
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if content:
+                parts.append(content)
+                yield content
+
+        self.cache.set(key, ''.join(parts))
     
-    def generate_major_analysis(self, school_name, major_name, user_rank, cutoff_rank):
-        """生成专业分析和建议"""
-        try:
-            prompt = f"""
+    def _major_analysis_messages(self, school_name, major_name, user_rank, cutoff_rank):
+        """构建专业分析的对话消息"""
+        prompt = f"""
 作为一名专业的高考志愿填报顾问，请为以下情况提供分析和建议：
 
 院校：{school_name}
@@ -29,37 +91,20 @@ class DeepSeekService:
 
 请用简洁专业的语言回答，字数控制在200字以内。
             """
-            
-            response = self.client.chat.completions.create(
-                model=DEEPSEEK_MODEL,
-                messages=[
-                    {"role": "system", "content": "你是一位专业的高考志愿填报顾问，具有丰富的院校专业知识和招生经验。"},
-                    {"role": "user", "content": prompt}
-                ],
-                stream=False,
-                temperature=0.7
-            )
-            
-            return {
-                'success': True,
-                'analysis': response.choices[0].message.content
-            }
-            
-        except Exception as e:
-            return {
-                'success': False,
-                'analysis': f'专业分析生成失败: {str(e)}'
-            }
-    
-    def generate_volunteer_strategy(self, recommendations_data, user_rank, track):
-        """生成整体志愿填报策略建议"""
-        try:
-            # 统计推荐结果
-            chong_count = len(recommendations_data.get('冲', []))
-            wen_count = len(recommendations_data.get('稳', []))
-            bao_count = len(recommendations_data.get('保', []))
-            
-            prompt = f"""
+
+        return [
+            {"role": "system", "content": "你是一位专业的高考志愿填报顾问，具有丰富的院校专业知识和招生经验。"},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _volunteer_strategy_messages(self, recommendations_data, user_rank, track):
+        """构建志愿填报策略的对话消息"""
+        # 统计推荐结果
+        chong_count = len(recommendations_data.get('冲', []))
+        wen_count = len(recommendations_data.get('稳', []))
+        bao_count = len(recommendations_data.get('保', []))
+        
+        prompt = f"""
 作为高考志愿填报专家，请为以下考生提供2025年志愿填报策略：
 
 考生情况：
@@ -76,20 +121,64 @@ class DeepSeekService:
 
 要求简洁实用，字数控制在300字以内。
             """
+
+        return [
+            {"role": "system", "content": "你是一位经验丰富的高考志愿填报专家，善于为考生制定科学的填报策略。"},
+            {"role": "user", "content": prompt}
+        ]
+
+    def generate_major_analysis(self, school_name, major_name, user_rank, cutoff_rank):
+        """生成专业分析和建议"""
+        try:
+            analysis = self._chat(
+                self._major_analysis_messages(school_name, major_name, user_rank, cutoff_rank),
+                temperature=0.7
+            )
             
-            response = self.client.chat.completions.create(
-                model=DEEPSEEK_MODEL,
-                messages=[
-                    {"role": "system", "content": "你是一位经验丰富的高考志愿填报专家，善于为考生制定科学的填报策略。"},
-                    {"role": "user", "content": prompt}
-                ],
-                stream=False,
+            return {
+                'success': True,
+                'analysis': analysis
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'analysis': f'专业分析生成失败: {str(e)}'
+            }
+    
+    def generate_major_analyses(self, items):
+        """并发生成多条专业分析，按完成先后产出(序号, 结果)；单条失败不影响其他条目"""
+        futures = {}
+        invalid = []
+        for index, item in enumerate(items):
+            try:
+                args = (item['school_name'], item['major_name'], int(item['user_rank']), int(item['cutoff_rank']))
+            except (KeyError, TypeError, ValueError):
+                invalid.append(index)
+                continue
+            futures[self.executor.submit(self.generate_major_analysis, *args)] = index
+
+        try:
+            for index in invalid:
+                yield index, {'success': False, 'analysis': '专业分析生成失败: 缺少必要参数'}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            # 调用方提前结束（如客户端断开）时取消尚未开始的任务
+            for future in futures:
+                future.cancel()
+    
+    def generate_volunteer_strategy(self, recommendations_data, user_rank, track):
+        """生成整体志愿填报策略建议"""
+        try:
+            strategy = self._chat(
+                self._volunteer_strategy_messages(recommendations_data, user_rank, track),
                 temperature=0.7
             )
             
             return {
                 'success': True,
-                'strategy': response.choices[0].message.content
+                'strategy': strategy
             }
             
         except Exception as e:
@@ -97,6 +186,20 @@ class DeepSeekService:
                 'success': False,
                 'strategy': f'策略建议生成失败: {str(e)}'
             }
+
+    def stream_major_analysis(self, school_name, major_name, user_rank, cutoff_rank):
+        """流式生成专业分析，逐段产出文本"""
+        return self._chat_stream(
+            self._major_analysis_messages(school_name, major_name, user_rank, cutoff_rank),
+            temperature=0.7
+        )
+
+    def stream_volunteer_strategy(self, recommendations_data, user_rank, track):
+        """流式生成志愿填报策略，逐段产出文本"""
+        return self._chat_stream(
+            self._volunteer_strategy_messages(recommendations_data, user_rank, track),
+            temperature=0.7
+        )
     
     def test_connection(self):
         """测试DeepSeek API连接"""
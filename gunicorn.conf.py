@@ -0,0 +1,17 @@
+# gunicorn生产部署配置：gunicorn -c gunicorn.conf.py app:app
+import multiprocessing
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+
+# 多进程 + 每进程多线程：推荐计算受GIL限制，靠多进程利用多核；线程用于并发处理AI流式输出等等待型请求
+# （上传进度、AI策略等后台任务的状态保存在共享的任务存储中，轮询和SSE请求可以落到任一worker）
+workers = int(os.getenv('WEB_WORKERS', str(multiprocessing.cpu_count())))
+threads = int(os.getenv('WEB_THREADS', '4'))
+worker_class = 'gthread'
+
+# 在主进程中加载app（包括最新数据快照）后再fork，各worker共享同一份只读数据
+preload_app = True
+
+# SSE流式输出时连接保持较久
+timeout = int(os.getenv('WEB_TIMEOUT', '120'))
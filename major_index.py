@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# 合并数据中同一专业组的专业名称之间的分隔符
+MAJOR_SEPARATOR = ' | '
+
+
+class MajorIndex:
+    """专业倒排索引 - 入库时把每行的专业列表拆成专业名称，建立 专业名称 -> 行号 的倒排表；
+    查询时只在不重复的专业名称上做子串匹配，再合并命中专业的行号，不再逐行扫描拼接后的字符串"""
+
+    def __init__(self, tokens, starts, rows, cache_size=256):
+        self.tokens = tokens    # 不重复的专业名称
+        self.starts = starts    # 每个专业名称在rows中的起始位置（长度为len(tokens)+1）
+        self.rows = rows        # 按专业名称分段、段内升序的行号
+        self._vocabulary = pd.Series(tokens, dtype=object)
+
+        # 关键词组合 -> 命中行号，同一筛选条件的重复请求不再匹配
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_names(cls, major_names):
+        """从每行的专业列表（以MAJOR_SEPARATOR拼接的字符串）构建倒排索引"""
+        names = pd.Series(major_names, dtype=object).reset_index(drop=True)
+        codes, uniques = pd.factorize(names)
+
+        # 只拆分不重复的专业列表，再按编码展开到每一行
+        token_lists = [str(value).split(MAJOR_SEPARATOR) for value in uniques]
+        counts = np.array([len(tokens) for tokens in token_lists], dtype=np.int64)
+        token_codes, tokens = pd.factorize(pd.Series(
+            [token for tokens in token_lists for token in tokens], dtype=object
+        ))
+        list_starts = np.r_[0, np.cumsum(counts)[:-1]] if len(counts) else np.empty(0, dtype=np.int64)
+
+        valid_rows = np.flatnonzero(codes >= 0)
+        row_counts = counts[codes[valid_rows]]
+        total = int(row_counts.sum())
+        row_ids = np.repeat(valid_rows, row_counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(row_counts) - row_counts, row_counts)
+        row_tokens = token_codes[np.repeat(list_starts[codes[valid_rows]], row_counts) + offsets]
+
+        # 按(专业名称, 行号)排序去重，得到每个专业名称的升序行号段
+        pairs = np.unique(row_tokens.astype(np.int64) * max(len(names), 1) + row_ids)
+        pair_tokens = pairs // max(len(names), 1)
+        rows = pairs % max(len(names), 1)
+        starts = np.searchsorted(pair_tokens, np.arange(len(tokens) + 1))
+        return cls(np.asarray(tokens, dtype=object), starts, rows)
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def match(self, keywords):
+        """包含任一关键词的专业所在的行号（升序）；关键词按普通文本做子串匹配，不作为正则解释"""
+        key = tuple(sorted(set(str(keyword) for keyword in keywords)))
+        with self._lock:
+            rows = self._cache.get(key)
+            if rows is not None:
+                self._cache.move_to_end(key)
+                return rows
+
+        hits = np.zeros(len(self.tokens), dtype=bool)
+        for keyword in key:
+            hits |= self._vocabulary.str.contains(keyword, regex=False).to_numpy(dtype=bool)
+        rows = np.unique(self.rows[np.repeat(hits, np.diff(self.starts))])
+        rows.flags.writeable = False
+
+        with self._lock:
+            self._cache[key] = rows
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return rows
+
+    def contains(self, positions, keywords):
+        """positions（行号数组）中每一行是否包含任一关键词"""
+        rows = self.match(keywords)
+        if len(rows) == 0:
+            return np.zeros(len(positions), dtype=bool)
+        found = np.searchsorted(rows, positions).clip(max=len(rows) - 1)
+        return rows[found] == positions
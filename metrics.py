@@ -0,0 +1,139 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# 耗时直方图的桶（秒）与行数直方图的桶
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+ROW_BUCKETS = (0, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000, 500000)
+
+
+class Metrics:
+    """进程内指标 - 计数器、仪表和直方图，以Prometheus文本格式输出；
+    多进程部署时每个worker各自统计，由Prometheus按实例汇总"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}         # 指标名 -> (类型, 说明, 直方图桶)
+        self._counters = {}     # (指标名, 标签) -> 数值
+        self._gauges = {}       # (指标名, 标签) -> 数值
+        self._histograms = {}   # (指标名, 标签) -> [各桶计数, 总和, 次数]
+        self._synced = {}       # (指标名, 标签) -> 上次同步的外部累计值
+
+    def describe(self, name, kind, help_text, buckets=None):
+        """登记指标类型和说明（counter、gauge、histogram）；直方图未指定桶时使用耗时桶"""
+        with self._lock:
+            self._help[name] = (kind, help_text, tuple(buckets or LATENCY_BUCKETS))
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        """计数器加value"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def sync(self, name, total, **labels):
+        """把其他组件自己维护的累计值（如缓存命中次数）同步到计数器：按与上次同步的差值累加；
+        累计值变小说明来源已重置，重置后的值全部计入，计数器始终单调递增"""
+        key = self._key(name, labels)
+        with self._lock:
+            previous = self._synced.get(key, 0)
+            self._synced[key] = total
+            self._counters[key] = self._counters.get(key, 0) + (total - previous if total >= previous else total)
+
+    def set(self, name, value, **labels):
+        """设置仪表值"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def clear(self, name):
+        """清空仪表的全部标签组合（如已淘汰的数据集）"""
+        with self._lock:
+            for key in [key for key in self._gauges if key[0] == name]:
+                del self._gauges[key]
+
+    def observe(self, name, value, **labels):
+        """直方图记录一次观测值"""
+        key = self._key(name, labels)
+        with self._lock:
+            buckets = self._help.get(name, (None, None, LATENCY_BUCKETS))[2]
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+                    break
+            histogram[1] += value
+            histogram[2] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """计时代码块，耗时（秒）记入直方图"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (
+            (key, value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"'))
+            for key, value in pairs
+        )
+        return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+    def render(self):
+        """Prometheus文本格式（0.0.4）"""
+        with self._lock:
+            samples = {}
+            for (name, labels), value in list(self._counters.items()) + list(self._gauges.items()):
+                samples.setdefault(name, []).append(f'{name}{self._labels(labels)} {value}')
+            for (name, labels), (counts, total, count) in self._histograms.items():
+                buckets = self._help.get(name, (None, None, LATENCY_BUCKETS))[2]
+                lines = samples.setdefault(name, [])
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{self._labels(labels, [("le", repr(float(bound)))])} {cumulative}')
+                lines.append(f'{name}_bucket{self._labels(labels, [("le", "+Inf")])} {count}')
+                lines.append(f'{name}_sum{self._labels(labels)} {total}')
+                lines.append(f'{name}_count{self._labels(labels)} {count}')
+
+            output = []
+            for name in sorted(samples):
+                kind, help_text, _ = self._help.get(name, ('untyped', '', None))
+                if help_text:
+                    output.append(f'# HELP {name} {help_text}')
+                output.append(f'# TYPE {name} {kind}')
+                output.extend(samples[name])
+            return '\n'.join(output) + '\n'
+
+
+# 进程内共享的指标实例，数据处理、推荐和Web接口都记录到这里
+METRICS = Metrics()
+METRICS.describe('ingest_stage_seconds', 'histogram', '数据处理各阶段耗时（秒）')
+METRICS.describe('ingest_runs_total', 'counter', '数据处理次数（按结果）')
+METRICS.describe('http_request_duration_seconds', 'histogram', '接口耗时（秒，不含流式响应的传输时间）')
+METRICS.describe('recommend_filter_rows', 'histogram', '推荐筛选各步骤后的行数', ROW_BUCKETS)
+METRICS.describe('recommend_batch_students', 'histogram', '批量推荐每次的考生数', ROW_BUCKETS)
+METRICS.describe('recommendation_cache_hits_total', 'counter', '推荐结果缓存命中次数')
+METRICS.describe('recommendation_cache_misses_total', 'counter', '推荐结果缓存未命中次数')
+METRICS.describe('recommendation_cache_hit_ratio', 'gauge', '推荐结果缓存命中率')
+METRICS.describe('recommendation_cache_entries', 'gauge', '推荐结果缓存条目数')
+METRICS.describe('recommendation_cache_bytes', 'gauge', '推荐结果缓存占用内存（字节）')
+METRICS.describe('deepseek_cache_hits_total', 'counter', 'AI回复缓存命中次数')
+METRICS.describe('deepseek_cache_misses_total', 'counter', 'AI回复缓存未命中次数')
+METRICS.describe('deepseek_cache_hit_ratio', 'gauge', 'AI回复缓存命中率')
+METRICS.describe('dataset_rows', 'gauge', '常驻数据集的合并数据行数')
+METRICS.describe('dataset_bytes', 'gauge', '常驻数据集各部分占用内存（字节）')
+METRICS.describe('dataset_resident_bytes', 'gauge', '常驻数据集占用内存合计（字节）')
+METRICS.describe('dataset_loads_total', 'counter', '数据集加载次数')
+METRICS.describe('dataset_evictions_total', 'counter', '数据集淘汰次数')
@@ -0,0 +1,156 @@
+import sys
+import threading
+from collections import OrderedDict
+
+
+class RecommendationCache:
+    """推荐结果LRU缓存 - 键为(数据集版本, 规范化查询)，同时限制条目数和内存占用"""
+
+    def __init__(self, max_entries=2048, max_bytes=64 * 1024 * 1024, rank_bucket=0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.rank_bucket = rank_bucket  # 位次分桶宽度，0表示按精确位次缓存
+
+        self._entries = OrderedDict()   # key -> (result, size)
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize_filters(filters):
+        """规范化筛选条件；城市筛选目前不参与推荐计算，因此不进入缓存键"""
+        filters = filters or {}
+        majors = filters.get('majors') or []
+        return (
+            bool(filters.get('is_985')),
+            bool(filters.get('is_211')),
+            tuple(sorted(set(str(major) for major in majors)))
+        )
+
+    def get_or_compute(self, version, index, user_rank, track, filters, compute, limit_per_type=50):
+        """命中则返回缓存结果的副本，否则调用compute()计算并写入缓存"""
+        normalized = (track, self.normalize_filters(filters), limit_per_type)
+
+        # 分桶模式：只有当整个位次桶内冲/稳/保划分不可能变化时才按桶共享结果
+        bucket = self._safe_bucket(index, user_rank)
+        if bucket is not None:
+            key = (version, 'bucket', bucket) + normalized
+        else:
+            key = (version, 'rank', user_rank) + normalized
+
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            if bucket is not None and not result.get('success'):
+                # 失败提示中包含具体位次，改按精确位次缓存
+                key = (version, 'rank', user_rank) + normalized
+            self.put(key, result)
+        elif bucket is not None:
+            result = self._rescore(result, user_rank)
+
+        return dict(result)
+
+    def get(self, key):
+        """按键读取缓存，命中时移到最近使用位置"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, result):
+        """写入缓存，超过条目数或内存上限时淘汰最久未使用的结果"""
+        size = self._estimate_size(result)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self._entries[key] = (result, size)
+            self.total_bytes += size
+
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """清空缓存（数据集更新后释放旧版本结果占用的内存）"""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        """缓存命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'rank_bucket': self.rank_bucket,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0
+            }
+
+    def _safe_bucket(self, index, user_rank):
+        """返回位次所在桶号；桶内任一位次的筛选区间和冲/稳/保边界都不会跨过任何录取位次时才可共享"""
+        if not self.rank_bucket or index is None or user_rank <= 0:
+            return None
+
+        bucket = user_rank // self.rank_bucket
+        low = max(1, bucket * self.rank_bucket)
+        high = (bucket + 1) * self.rank_bucket - 1
+
+        # 与Recommender中的分类边界和三档位次区间一一对应，均随位次单调不减
+        boundaries = [
+            lambda r: r - 500,
+            lambda r: r + 500,
+            lambda r: max(1, int(r * 0.6)),
+            lambda r: int(r * 1.8),
+            lambda r: max(1, int(r * 0.4)),
+            lambda r: int(r * 2.5),
+            lambda r: max(1, int(r * 0.2)),
+            lambda r: int(r * 4.0),
+        ]
+        for boundary in boundaries:
+            if index.count_between(boundary(low), boundary(high)) > 0:
+                return None
+        return bucket
+
+    @staticmethod
+    def _rescore(result, user_rank):
+        """分桶命中时按实际位次重算风险值和差异百分比（分类与排序在桶内不变）"""
+        data = {}
+        for rec_type, records in result['data'].items():
+            rescored = []
+            for record in records:
+                cutoff_rank = record['cutoff_rank']
+                record = dict(record)
+                record['risk_level'] = (user_rank - cutoff_rank) / cutoff_rank if cutoff_rank else 0
+                record['diff_percentage'] = round((cutoff_rank - user_rank) / user_rank * 100, 2)
+                rescored.append(record)
+            data[rec_type] = rescored
+        return dict(result, data=data)
+
+    @staticmethod
+    def _estimate_size(result):
+        """粗略估算结果占用的内存字节数（记录中的字符串与数据集共享，不重复计入）"""
+        size = sys.getsizeof(result) + sys.getsizeof(result.get('message', ''))
+        for records in result.get('data', {}).values():
+            size += sys.getsizeof(records)
+            for record in records:
+                size += sys.getsizeof(record) + sum(
+                    sys.getsizeof(value) for value in record.values() if not isinstance(value, str)
+                )
+        return size
@@ -0,0 +1,149 @@
+import csv
+import io
+import math
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+# 导出表格的表头，每行为一个考生的一条推荐
+EXPORT_HEADERS = (
+    '考生编号', '考生位次', '科目', '类型', '院校名称', '专业组', '专业',
+    '最低分', '最低位次', '计划人数', '985', '211', '位次差异(%)'
+)
+
+# XML 1.0不允许的控制字符
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="推荐结果" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+class _ChunkBuffer:
+    """只写的输出缓冲区 - zipfile写入后由生成器取走已写入的字节，缓冲区不随导出行数增长"""
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
+
+
+class RecommendationExporter:
+    """推荐结果导出 - 逐个考生生成推荐并逐行写出CSV或Excel，边生成边以分块响应返回，
+    内存占用与导出行数无关（Excel按只写方式直接生成工作表XML并流式压缩，不在内存中构建工作簿）"""
+
+    CHUNK_SIZE = 64 * 1024  # 缓冲区达到该大小时输出一块
+
+    def __init__(self, recommender, limit_per_type=50):
+        self.recommender = recommender
+        self.limit_per_type = limit_per_type
+
+    def rows(self, students):
+        """逐行产出导出数据；students为[{'rank', 'track', 'filters', 'id'}]，按冲/稳/保顺序展开每个考生的推荐"""
+        queries = ((student['rank'], student['track'], student.get('filters')) for student in students)
+        results = self.recommender.generate_recommendations_batch(list(queries), self.limit_per_type)
+        for student, result in zip(students, results):
+            for rec_type in ('冲', '稳', '保'):
+                for item in result['data'].get(rec_type, []):
+                    yield [
+                        student.get('id'), student['rank'], student['track'], rec_type,
+                        item['school_name'], item['major_group'], item['major_name'],
+                        item['cutoff_score'], item['cutoff_rank'], item['plan_count'],
+                        '是' if item['is_985'] else '', '是' if item['is_211'] else '',
+                        item['diff_percentage']
+                    ]
+
+    def csv(self, students):
+        """CSV分块（UTF-8带BOM，Excel可直接打开）"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write('\ufeff')
+        writer.writerow(EXPORT_HEADERS)
+        for row in self.rows(students):
+            writer.writerow(['' if value is None else value for value in row])
+            if buffer.tell() >= self.CHUNK_SIZE:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode('utf-8')
+
+    def xlsx(self, students):
+        """Excel分块：以流式zip写出最小的xlsx包，工作表行使用内联字符串，不需要共享字符串表"""
+        output = _ChunkBuffer()
+        # 边生成边压缩，使用最快的压缩级别（重复的院校、专业名称压缩率仍然很高）
+        with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as package:
+            package.writestr('[Content_Types].xml', _CONTENT_TYPES)
+            package.writestr('_rels/.rels', _ROOT_RELS)
+            package.writestr('xl/workbook.xml', _WORKBOOK)
+            package.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+            yield output.drain()
+
+            with package.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+                sheet.write(
+                    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                )
+                sheet.write(self._xlsx_row(EXPORT_HEADERS))
+                for row in self.rows(students):
+                    sheet.write(self._xlsx_row(row))
+                    if output.size >= self.CHUNK_SIZE:
+                        yield output.drain()
+                sheet.write(b'</sheetData></worksheet>')
+        yield output.drain()
+
+    @staticmethod
+    def _xlsx_row(values):
+        cells = []
+        for value in values:
+            if value is None or value == '' or (isinstance(value, float) and not math.isfinite(value)):
+                cells.append('<c/>')
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                cells.append(f'<c><v>{value!r}</v></c>')
+            else:
+                text = escape(_ILLEGAL_XML.sub('', str(value)))
+                cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+        return ('<row>' + ''.join(cells) + '</row>').encode('utf-8')
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+from major_index import MajorIndex
+from school_labeler import SCHOOL_FLAGS, pack_school_flags
+
+
+class RecommendationIndex:
+    """推荐索引 - 入库时由merged_df构建一次，按科目分区并按录取位次排序，
+    另有专业倒排索引和985/211标识位，筛选条件在行号上求交集；构建后只读"""
+
+    def __init__(self, merged_df, partitions=None, majors=None):
+        self.has_track = 'track' in merged_df.columns
+
+        # 专业倒排索引（从快照挂载时直接使用已保存的倒排表）
+        if majors is None and 'major_name' in merged_df.columns:
+            majors = MajorIndex.from_names(merged_df['major_name'])
+        self.majors = majors
+
+        # 每行的985/211标识位（未压缩的数据由布尔列打包）
+        if 'school_flags' in merged_df.columns:
+            self._flags = merged_df['school_flags'].to_numpy()
+        elif 'is_985' in merged_df.columns or 'is_211' in merged_df.columns:
+            self._flags = pack_school_flags(
+                merged_df['is_985'] if 'is_985' in merged_df.columns else np.zeros(len(merged_df), dtype=bool),
+                merged_df['is_211'] if 'is_211' in merged_df.columns else np.zeros(len(merged_df), dtype=bool)
+            )
+        else:
+            self._flags = None
+
+        # 从快照挂载：直接使用已排好序的分区数组（merged_df的位次列须已是数值类型）
+        if partitions is not None:
+            self.frame = merged_df
+            self._all = partitions[None]
+            self._partitions = {track: arrays for track, arrays in partitions.items() if track is not None}
+            self._size = len(self._all[0])
+            return
+
+        # 位次列一次性转为数值，索引中只收录有效位次的行
+        cutoff_rank = pd.to_numeric(merged_df['cutoff_rank'], errors='coerce').to_numpy(dtype=np.float64)
+        valid_positions = np.flatnonzero(~np.isnan(cutoff_rank))
+
+        # 位次列已是数值类型（包括压缩后的float32/整数）时直接引用原数据（内存映射的快照不会被复制），
+        # 否则复制一份并写入数值位次
+        rank_dtype = merged_df['cutoff_rank'].dtype
+        if pd.api.types.is_numeric_dtype(rank_dtype) and not pd.api.types.is_bool_dtype(rank_dtype):
+            self.frame = merged_df
+        else:
+            self.frame = merged_df.copy()
+            self.frame['cutoff_rank'] = cutoff_rank
+        self._size = len(valid_positions)
+
+        self._all = self._build_partition(cutoff_rank, valid_positions)
+
+        # 按科目分区，每个分区内按位次排序（位次相同时保持原有顺序）
+        self._partitions = {}
+        if self.has_track:
+            codes, tracks = pd.factorize(self.frame['track'].iloc[valid_positions])
+            for code, track in enumerate(tracks):
+                self._partitions[track] = self._build_partition(cutoff_rank, valid_positions[codes == code])
+
+    @staticmethod
+    def _build_partition(ranks, positions):
+        order = np.argsort(ranks[positions], kind='stable')
+        sorted_ranks = ranks[positions][order]
+        sorted_positions = positions[order]
+        sorted_ranks.flags.writeable = False
+        sorted_positions.flags.writeable = False
+        return sorted_ranks, sorted_positions
+
+    def __len__(self):
+        return self._size
+
+    def partitions(self):
+        """全部分区{科目: (位次升序数组, 行号数组)}，None键为全部数据"""
+        partitions = {None: self._all}
+        partitions.update(self._partitions)
+        return partitions
+
+    def partition(self, track=None):
+        """获取科目分区（位次升序数组, 行号数组）；track为None时返回全部数据"""
+        if track is None:
+            return self._all
+        return self._partitions.get(track, (np.empty(0), np.empty(0, dtype=np.int64)))
+
+    def count(self, track=None):
+        """分区内的数据量"""
+        return len(self.partition(track)[0])
+
+    def window(self, track, min_rank, max_rank):
+        """二分查找位次区间[min_rank, max_rank]，返回按原有顺序排列的行号"""
+        ranks, positions = self.partition(track)
+        start = np.searchsorted(ranks, min_rank, side='left')
+        stop = np.searchsorted(ranks, max_rank, side='right')
+        return np.sort(positions[start:stop])
+
+    def count_between(self, min_rank, max_rank, track=None):
+        """位次落在[min_rank, max_rank]内的数据量"""
+        ranks = self.partition(track)[0]
+        return int(np.searchsorted(ranks, max_rank, side='right') - np.searchsorted(ranks, min_rank, side='left'))
+
+    def has_flags(self):
+        """是否有985/211标识数据"""
+        return self._flags is not None
+
+    def flag(self, positions, name):
+        """positions（行号数组）中每一行是否带有院校标识"""
+        return (self._flags[positions] & SCHOOL_FLAGS[name]) != 0
+
+    def has_majors(self):
+        """是否有专业数据"""
+        return self.majors is not None
+
+    def major_match(self, positions, majors):
+        """positions（行号数组）中每一行是否包含任一所选专业"""
+        return self.majors.contains(positions, majors)
+
+    def take(self, positions):
+        """按行号取出数据（只复制结果行）"""
+        return self.frame.take(positions)
+
+    def rank_range(self):
+        """全部数据的位次范围，无数据时返回None"""
+        ranks = self._all[0]
+        if len(ranks) == 0:
+            return None
+        return ranks[0], ranks[-1]
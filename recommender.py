@@ -1,9 +1,41 @@
+import random
+
+import numpy as np
 import pandas as pd
-from config import RISK_THRESHOLD_CHONG, RISK_THRESHOLD_WEN
+from config import RISK_THRESHOLD_CHONG, RISK_THRESHOLD_WEN, DEBUG_SAMPLE_RATE
+from school_labeler import school_flag
+from metrics import METRICS
+
+# 推荐结果中每条记录的字段顺序
+RESULT_FIELDS = (
+    'school_name', 'major_group', 'major_name', 'cutoff_score', 'cutoff_rank',
+    'plan_count', 'is_985', 'is_211', 'risk_level', 'diff_percentage'
+)
+
+
+def _top_k_indices(keys, k):
+    """返回keys中最小的前k个下标（升序，相同键值保持原有顺序，NaN排在最后），只对前k个做排序"""
+    n = len(keys)
+    if k is None or k >= n:
+        return np.argsort(keys, kind='stable')
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    kth = np.partition(keys, k - 1)[k - 1]
+    if np.isnan(kth):
+        below = np.flatnonzero(~np.isnan(keys))
+        equal = np.flatnonzero(np.isnan(keys))
+    else:
+        below = np.flatnonzero(keys < kth)
+        equal = np.flatnonzero(keys == kth)
+    chosen = np.concatenate([below, equal[:k - len(below)]])
+    return chosen[np.argsort(keys[chosen], kind='stable')]
+
 
 class Recommender:
-    def __init__(self, data_processor):
-        self.data_processor = data_processor
+    def __init__(self, dataset):
+        # 只读数据集（Dataset，处理过程中也可直接传入DataProcessor）
+        self.dataset = dataset
     
     def get_recommendation_type(self, user_rank, cutoff_rank):
         """判断推荐类型：冲/稳/保 - 修正版本，范围更宽松"""
@@ -69,56 +101,139 @@ class Recommender:
         except:
             return None
     
+    def score_recommendations(self, df, user_rank, limit_per_type=50):
+        """向量化打分：数组运算得到冲/稳/保分类、风险等级和差异百分比，部分选择取前K条后按列一次性生成结果"""
+        if df.empty:
+            return {'冲': [], '稳': [], '保': []}
+        return self.score_rows(self.result_columns(df), np.arange(len(df)), user_rank, limit_per_type)
+
+    @staticmethod
+    def result_columns(df):
+        """打分和输出用到的列一次性转为数组，缺失列使用与原逐行逻辑相同的默认值；
+        批量推荐时对整个数据集只转换一次，各考生按行号取用"""
+        n = len(df)
+        columns = {'cutoff_rank': pd.to_numeric(df['cutoff_rank'], errors='coerce').to_numpy(dtype=np.float64)}
+        for name in ('school_name', 'major_group', 'major_name'):
+            columns[name] = df[name].to_numpy(dtype=object) if name in df.columns else np.full(n, '', dtype=object)
+        for name in ('cutoff_score', 'plan_count'):
+            if name in df.columns:
+                values = pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=np.float64)
+                columns[name] = np.where(np.isnan(values), 0, values).astype(np.int64)
+            else:
+                columns[name] = np.zeros(n, dtype=np.int64)
+        for name in ('is_985', 'is_211'):
+            flags = school_flag(df, name)
+            columns[name] = flags if flags is not None else np.zeros(n, dtype=bool)
+        return columns
+
+    def score_rows(self, columns, rows, user_rank, limit_per_type=50):
+        """对result_columns中的rows行（按原有顺序）打分，返回{'冲': [...], '稳': [...], '保': [...]}"""
+        result = {'冲': [], '稳': [], '保': []}
+        cutoff_rank = columns['cutoff_rank'][rows]
+        known = ~np.isnan(cutoff_rank)
+
+        # 分类逻辑与get_recommendation_type一致：比用户好500名以上为冲，±500名内为稳，其余为保
+        rec_type = np.select(
+            [cutoff_rank <= user_rank - 500, cutoff_rank <= user_rank + 500],
+            [0, 1],
+            default=2
+        )
+
+        # 风险值与差异百分比，除零时分别取0和NaN（与逐行计算时的异常处理一致）
+        with np.errstate(divide='ignore', invalid='ignore'):
+            risk_level = np.where(cutoff_rank != 0, (user_rank - cutoff_rank) / cutoff_rank, 0.0)
+            if user_rank != 0:
+                diff_percentage = (cutoff_rank - user_rank) / user_rank
+            else:
+                diff_percentage = np.full(len(cutoff_rank), np.nan)
+
+        for code, type_name in enumerate(['冲', '稳', '保']):
+            chosen = np.flatnonzero(known & (rec_type == code))
+            if len(chosen) == 0:
+                continue
+
+            # 排序：冲线按差异百分比升序，稳和保按差异百分比降序；相同值保持原有顺序
+            keys = diff_percentage[chosen] if type_name == '冲' else -diff_percentage[chosen]
+            chosen = chosen[_top_k_indices(keys, limit_per_type)]
+            selected = rows[chosen]
+
+            diff = diff_percentage[chosen]
+            risk = risk_level[chosen]
+            values = [
+                columns['school_name'][selected].tolist(),
+                columns['major_group'][selected].tolist(),
+                columns['major_name'][selected].tolist(),
+                columns['cutoff_score'][selected].tolist(),
+                cutoff_rank[chosen].astype(np.int64).tolist(),
+                columns['plan_count'][selected].tolist(),
+                columns['is_985'][selected].tolist(),
+                columns['is_211'][selected].tolist(),
+                np.where(np.isnan(risk), 0, risk).tolist(),
+                [0 if value != value else round(value, 2) for value in (diff * 100).tolist()],
+            ]
+            result[type_name] = [dict(zip(RESULT_FIELDS, row)) for row in zip(*values)]
+
+        return result
+    
     def filter_data(self, user_rank, track, filters=None):
-        """根据条件筛选数据 - 适配实际数据结构"""
-        if self.data_processor.merged_df is None:
+        """根据条件筛选数据 - 基于预排序的推荐索引，只复制落在位次区间内的行；
+        各步骤的行数记入指标，逐步打印和数据分布分析只对按DEBUG_SAMPLE_RATE抽样的请求输出"""
+        index = self.dataset.get_recommendation_index()
+        if index is None:
             return pd.DataFrame()
 
-        df = self.data_processor.merged_df.copy()
-
-        # 清理数据：确保位次是数值类型
-        df['cutoff_rank'] = pd.to_numeric(df['cutoff_rank'], errors='coerce')
-        df = df.dropna(subset=['cutoff_rank'])
-
-        print(f"原始数据量: {len(df)}")
+        debug = DEBUG_SAMPLE_RATE > 0 and random.random() < DEBUG_SAMPLE_RATE
+        if debug:
+            print(f"原始数据量: {len(index)}")
 
         # 基础筛选：科目要求（如果有track列的话）
-        if 'track' in df.columns:
-            track_filtered = df[df['track'] == track]
-            if len(track_filtered) > 0:
-                df = track_filtered
-                print(f"科目'{track}'筛选后: {len(df)}条")
-            else:
+        partition = None
+        if index.has_track:
+            if index.count(track) > 0:
+                partition = track
+                if debug:
+                    print(f"科目'{track}'筛选后: {index.count(track)}条")
+            elif debug:
                 print(f"警告：科目'{track}'筛选后无数据，使用所有数据")
 
-        # 应用用户筛选条件
-        if filters:
-            # 985筛选
-            if filters.get('is_985') and 'is_985' in df.columns:
-                df = df[df['is_985'] == True]
-                print(f"985筛选后: {len(df)}条")
-
-            # 211筛选
-            if filters.get('is_211') and 'is_211' in df.columns:
-                df = df[df['is_211'] == True]
-                print(f"211筛选后: {len(df)}条")
-
-            # 专业筛选
-            if filters.get('majors') and 'major_name' in df.columns:
-                df = df[df['major_name'].str.contains('|'.join(filters['majors']), na=False)]
-                print(f"专业筛选后: {len(df)}条")
-
         # 位次范围筛选 - 扩大范围以充分利用数据
         # 包含更多冲线和保底选择，让用户有更多选择
         min_rank = max(1, int(user_rank * 0.6))   # 最小位次（更多冲线选择）
         max_rank = int(user_rank * 1.8)           # 最大位次（更多保底选择）
 
-        df = df[(df['cutoff_rank'] >= min_rank) & (df['cutoff_rank'] <= max_rank)]
+        positions = index.window(partition, min_rank, max_rank)
+        METRICS.observe('recommend_filter_rows', len(positions), step='window')
 
-        print(f"位次范围筛选后: {len(df)}条，用户位次: {user_rank}，筛选范围: {min_rank}-{max_rank}")
+        # 应用用户筛选条件：在位次区间的行号上依次与标识位、专业倒排索引求交，只取出最终的行
+        if filters:
+            # 985筛选
+            if filters.get('is_985') and index.has_flags():
+                positions = positions[index.flag(positions, 'is_985')]
+                METRICS.observe('recommend_filter_rows', len(positions), step='is_985')
+                if debug:
+                    print(f"985筛选后: {len(positions)}条")
 
-        # 数据分布分析
-        if len(df) > 0:
+            # 211筛选
+            if filters.get('is_211') and index.has_flags():
+                positions = positions[index.flag(positions, 'is_211')]
+                METRICS.observe('recommend_filter_rows', len(positions), step='is_211')
+                if debug:
+                    print(f"211筛选后: {len(positions)}条")
+
+            # 专业筛选（按专业名称子串匹配，输入不作为正则解释）
+            if filters.get('majors') and index.has_majors():
+                positions = positions[index.major_match(positions, filters['majors'])]
+                METRICS.observe('recommend_filter_rows', len(positions), step='majors')
+                if debug:
+                    print(f"专业筛选后: {len(positions)}条")
+
+        df = index.take(positions)
+
+        if debug:
+            print(f"位次范围筛选后: {len(df)}条，用户位次: {user_rank}，筛选范围: {min_rank}-{max_rank}")
+
+        # 数据分布分析（仅调试抽样的请求计算）
+        if debug and len(df) > 0:
             rank_stats = df['cutoff_rank'].describe()
             print(f"📊 位次分布: 最小{int(rank_stats['min'])}, 最大{int(rank_stats['max'])}, 中位数{int(rank_stats['50%'])}")
 
@@ -128,38 +243,31 @@ class Recommender:
             bao_count = len(df[df['cutoff_rank'] > user_rank * 1.11])
             print(f"📈 推荐分布: 冲{chong_count}个, 稳{wen_count}个, 保{bao_count}个")
 
-        # 如果数据太少，逐步放宽范围
+        # 如果数据太少，逐步放宽范围（放宽时只保留科目筛选）
         if len(df) < 50:  # 提高阈值，确保有足够选择
-            print("数据量过少，逐步放宽位次范围...")
+            if debug:
+                print("数据量过少，逐步放宽位次范围...")
+            partition = track if track and index.has_track else None
 
             # 第一次放宽：扩大到0.4-2.5倍
             min_rank = max(1, int(user_rank * 0.4))
             max_rank = int(user_rank * 2.5)
-            df = self.data_processor.merged_df.copy()
-            df['cutoff_rank'] = pd.to_numeric(df['cutoff_rank'], errors='coerce')
-            df = df.dropna(subset=['cutoff_rank'])
-
-            # 重新应用科目筛选
-            if track and 'track' in df.columns:
-                df = df[df['track'] == track]
-
-            df = df[(df['cutoff_rank'] >= min_rank) & (df['cutoff_rank'] <= max_rank)]
-            print(f"第一次放宽后数据量: {len(df)}条，范围: {min_rank}-{max_rank}")
+            rows = index.window(partition, min_rank, max_rank)
+            if debug:
+                print(f"第一次放宽后数据量: {len(rows)}条，范围: {min_rank}-{max_rank}")
 
             # 如果还是太少，进一步放宽
-            if len(df) < 30:
+            if len(rows) < 30:
                 min_rank = max(1, int(user_rank * 0.2))
                 max_rank = int(user_rank * 4.0)
-                df = self.data_processor.merged_df.copy()
-                df['cutoff_rank'] = pd.to_numeric(df['cutoff_rank'], errors='coerce')
-                df = df.dropna(subset=['cutoff_rank'])
-
-                if track and 'track' in df.columns:
-                    df = df[df['track'] == track]
+                rows = index.window(partition, min_rank, max_rank)
+                if debug:
+                    print(f"第二次放宽后数据量: {len(rows)}条，范围: {min_rank}-{max_rank}")
 
-                df = df[(df['cutoff_rank'] >= min_rank) & (df['cutoff_rank'] <= max_rank)]
-                print(f"第二次放宽后数据量: {len(df)}条，范围: {min_rank}-{max_rank}")
+            df = index.take(rows)
+            METRICS.observe('recommend_filter_rows', len(df), step='relaxed')
 
+        METRICS.observe('recommend_filter_rows', len(df), step='result')
         return df
     
     def generate_recommendations(self, user_rank, track, filters=None, limit_per_type=50):
@@ -169,115 +277,173 @@ class Recommender:
             filtered_df = self.filter_data(user_rank, track, filters)
             
             if filtered_df.empty:
-                # 提供更详细的失败原因
-                total_df = self.data_processor.merged_df.copy() if self.data_processor.merged_df is not None else pd.DataFrame()
-                message = f"未找到匹配数据（用户位次：{user_rank}）。建议：\n"
-                
-                if total_df.empty:
-                    message += "1. 请检查数据文件是否正确上传\n"
-                else:
-                    valid_ranks = total_df.dropna(subset=['cutoff_rank']) if 'cutoff_rank' in total_df.columns else pd.DataFrame()
-                    if not valid_ranks.empty:
-                        min_rank = int(valid_ranks['cutoff_rank'].min())
-                        max_rank = int(valid_ranks['cutoff_rank'].max())
-                        message += f"1. 数据库位次范围：{min_rank}-{max_rank}\n"
-                        if user_rank < min_rank:
-                            message += "2. 您的位次较高，建议关注顶尖院校\n"
-                        elif user_rank > max_rank:
-                            message += "2. 您的位次较低，建议关注专科或其他批次\n"
-                    
-                    message += "3. 尝试取消985/211限制\n4. 考虑扩大地区范围\n5. 2025年数据与2024年可能存在差异"
-                
-                return {
-                    'success': False,
-                    'message': message,
-                    'data': {'冲': [], '稳': [], '保': []}
-                }
-            
-            # 计算推荐类型、风险等级和差异百分比
-            filtered_df['recommendation_type'] = filtered_df['cutoff_rank'].apply(
-                lambda x: self.get_recommendation_type(user_rank, x)
-            )
-            filtered_df['risk_level'] = filtered_df['cutoff_rank'].apply(
-                lambda x: self.calculate_risk_level(user_rank, x)
-            )
-            filtered_df['diff_percentage'] = filtered_df['cutoff_rank'].apply(
-                lambda x: self.calculate_diff_percentage(user_rank, x)
-            )
-            
-            # 移除未知类型
-            filtered_df = filtered_df[filtered_df['recommendation_type'] != '未知']
-            
-            # 按类型分组
-            result = {'冲': [], '稳': [], '保': []}
+                return self.no_match_result(user_rank)
             
-            for rec_type in ['冲', '稳', '保']:
-                type_df = filtered_df[filtered_df['recommendation_type'] == rec_type].copy()
-                
-                # 排序：冲线按差异百分比升序，稳和保按差异百分比降序
-                if rec_type == '冲':
-                    type_df = type_df.sort_values('diff_percentage', ascending=True)
-                else:
-                    type_df = type_df.sort_values('diff_percentage', ascending=False)
-                
-                # 限制数量
-                type_df = type_df.head(limit_per_type)
-                
-                # 转换为字典列表
-                for _, row in type_df.iterrows():
-                    result[rec_type].append({
-                        'school_name': row.get('school_name', ''),
-                        'major_group': row.get('major_group', ''),
-                        'major_name': row.get('major_name', ''),
-                        'cutoff_score': int(row.get('cutoff_score', 0)) if pd.notna(row.get('cutoff_score')) else 0,
-                        'cutoff_rank': int(row.get('cutoff_rank', 0)) if pd.notna(row.get('cutoff_rank')) else 0,
-                        'plan_count': int(row.get('plan_count', 0)) if pd.notna(row.get('plan_count')) else 0,
-                        'is_985': bool(row.get('is_985', False)),
-                        'is_211': bool(row.get('is_211', False)),
-                        'risk_level': float(row.get('risk_level', 0)) if pd.notna(row.get('risk_level')) else 0,
-                        'diff_percentage': round(row.get('diff_percentage', 0) * 100, 2) if pd.notna(row.get('diff_percentage')) else 0
-                    })
-            
-            # 统计信息
-            total_count = sum(len(result[key]) for key in result.keys())
-            if total_count == 0:
-                return {
-                    'success': False,
-                    'message': f'数据处理完成但无有效推荐（位次{user_rank}）。建议：1.放宽筛选条件 2.考虑年份差异影响 3.联系招生办获取最新信息',
-                    'data': {'冲': [], '稳': [], '保': []}
-                }
-            
-            message = f"找到 {total_count} 个推荐结果（冲:{len(result['冲'])}, 稳:{len(result['稳'])}, 保:{len(result['保'])}）\n⚠️ 注意：基于2024年数据，2025年实际情况可能有差异"
+            # 向量化计算推荐类型、风险等级和差异百分比，并按类型取前limit_per_type条
+            result = self.score_recommendations(filtered_df, user_rank, limit_per_type)
+            return self.recommendation_result(result, user_rank)
             
+        except Exception as e:
             return {
-                'success': True,
-                'message': message,
-                'data': result
+                'success': False,
+                'message': f'推荐生成失败: {str(e)}',
+                'data': {'冲': [], '稳': [], '保': []}
             }
+
+    def no_match_result(self, user_rank):
+        """筛选后没有数据时的结果，提供更详细的失败原因"""
+        index = self.dataset.get_recommendation_index()
+        message = f"未找到匹配数据（用户位次：{user_rank}）。建议：\n"
+        
+        if self.dataset.merged_df is None or self.dataset.merged_df.empty:
+            message += "1. 请检查数据文件是否正确上传\n"
+        else:
+            rank_range = index.rank_range()
+            if rank_range is not None:
+                min_rank = int(rank_range[0])
+                max_rank = int(rank_range[1])
+                message += f"1. 数据库位次范围：{min_rank}-{max_rank}\n"
+                if user_rank < min_rank:
+                    message += "2. 您的位次较高，建议关注顶尖院校\n"
+                elif user_rank > max_rank:
+                    message += "2. 您的位次较低，建议关注专科或其他批次\n"
             
-        except Exception as e:
+            message += "3. 尝试取消985/211限制\n4. 考虑扩大地区范围\n5. 2025年数据与2024年可能存在差异"
+        
+        return {
+            'success': False,
+            'message': message,
+            'data': {'冲': [], '稳': [], '保': []}
+        }
+
+    @staticmethod
+    def recommendation_result(result, user_rank):
+        """打分结果包装为接口返回的结构"""
+        # 统计信息
+        total_count = sum(len(result[key]) for key in result.keys())
+        if total_count == 0:
             return {
                 'success': False,
-                'message': f'推荐生成失败: {str(e)}',
+                'message': f'数据处理完成但无有效推荐（位次{user_rank}）。建议：1.放宽筛选条件 2.考虑年份差异影响 3.联系招生办获取最新信息',
                 'data': {'冲': [], '稳': [], '保': []}
             }
+        
+        message = f"找到 {total_count} 个推荐结果（冲:{len(result['冲'])}, 稳:{len(result['稳'])}, 保:{len(result['保'])}）\n⚠️ 注意：基于2024年数据，2025年实际情况可能有差异"
+        
+        return {
+            'success': True,
+            'message': message,
+            'data': result
+        }
+
+    @staticmethod
+    def filter_signature(filters):
+        """筛选条件中影响候选行的部分（985、211、专业关键词），相同签名的考生共用一次筛选"""
+        filters = filters or {}
+        majors = tuple(sorted(set(str(major) for major in filters.get('majors') or ())))
+        return bool(filters.get('is_985')), bool(filters.get('is_211')), majors
+
+    def candidate_partition(self, index, track, signature):
+        """科目分区中满足筛选条件的行（位次升序数组, 行号数组），规则与filter_data一致"""
+        partition = track if index.has_track and index.count(track) > 0 else None
+        ranks, positions = index.partition(partition)
+        is_985, is_211, majors = signature
+        keep = np.ones(len(positions), dtype=bool)
+        if is_985 and index.has_flags():
+            keep &= index.flag(positions, 'is_985')
+        if is_211 and index.has_flags():
+            keep &= index.flag(positions, 'is_211')
+        if majors and index.has_majors():
+            keep &= index.major_match(positions, list(majors))
+        return ranks[keep], positions[keep]
+
+    def generate_recommendations_batch(self, students, limit_per_type=50):
+        """批量生成推荐，students为[(位次, 科目, 筛选条件)]，按输入顺序逐个产出与generate_recommendations相同的结果；
+        考生按(科目, 筛选条件)分组，每组只筛选一次，整组的位次区间（含两次放宽）一次二分查找得到，
+        打分用的列对整个数据集只转换一次，不打印逐条的筛选过程"""
+        students = [(user_rank, track, filters) for user_rank, track, filters in students]
+        METRICS.observe('recommend_batch_students', len(students))
+        index = self.dataset.get_recommendation_index()
+        if index is None:
+            for user_rank, track, filters in students:
+                yield self.generate_recommendations(user_rank, track, filters, limit_per_type)
+            return
+
+        groups = {}
+        for i, (user_rank, track, filters) in enumerate(students):
+            groups.setdefault((track, self.filter_signature(filters)), []).append(i)
+
+        # 每个考生的候选行区间：(行号数组, 起点, 终点)；某组筛选出错时组内每个考生单独返回错误，不影响其他组
+        windows = [None] * len(students)
+        failures = {}
+        for (track, signature), members in groups.items():
+            try:
+                user_ranks = np.array([students[i][0] for i in members], dtype=np.float64)
+                ranks, positions = self.candidate_partition(index, track, signature)
+                starts, stops = self._windows(ranks, user_ranks, 0.6, 1.8)
+
+                # 数据太少时放宽位次范围（放宽时只保留科目筛选）
+                sparse = np.flatnonzero(stops - starts < 50)
+                if len(sparse):
+                    partition = track if track and index.has_track else None
+                    relaxed_ranks, relaxed_positions = index.partition(partition)
+                    first = self._windows(relaxed_ranks, user_ranks[sparse], 0.4, 2.5)
+                    second = self._windows(relaxed_ranks, user_ranks[sparse], 0.2, 4.0)
+                    widen = first[1] - first[0] < 30
+                for k, i in enumerate(members):
+                    windows[i] = (positions, starts[k], stops[k])
+                for j, k in enumerate(sparse):
+                    window = second if widen[j] else first
+                    windows[members[k]] = (relaxed_positions, window[0][j], window[1][j])
+            except Exception as e:
+                for i in members:
+                    failures[i] = str(e)
+
+        try:
+            columns = self.result_columns(index.frame)
+        except Exception as e:
+            failures = dict.fromkeys(range(len(students)), str(e))
+
+        for i, ((user_rank, track, filters), window) in enumerate(zip(students, windows)):
+            if i in failures:
+                yield self.failure_result(failures[i])
+                continue
+            try:
+                positions, start, stop = window
+                rows = np.sort(positions[start:stop])
+                if len(rows) == 0:
+                    yield self.no_match_result(user_rank)
+                    continue
+                result = self.score_rows(columns, rows, user_rank, limit_per_type)
+                yield self.recommendation_result(result, user_rank)
+            except Exception as e:
+                yield self.failure_result(str(e))
+
+    @staticmethod
+    def failure_result(error):
+        """推荐生成出错时的结果"""
+        return {
+            'success': False,
+            'message': f'推荐生成失败: {error}',
+            'data': {'冲': [], '稳': [], '保': []}
+        }
+
+    @staticmethod
+    def _windows(ranks, user_ranks, low, high):
+        """一组考生的位次区间[max(1, int(位次*low)), int(位次*high)]在升序位次数组中的起止位置"""
+        min_ranks = np.maximum(1, np.trunc(user_ranks * low))
+        max_ranks = np.trunc(user_ranks * high)
+        return np.searchsorted(ranks, min_ranks, side='left'), np.searchsorted(ranks, max_ranks, side='right')
     
     def get_user_score_from_rank(self, user_rank):
         """根据位次获取大致分数"""
         try:
-            if self.data_processor.score_rank_df is None:
+            table = self.dataset.get_score_rank_table()
+            if table is None:
                 return None
-            
-            df = self.data_processor.score_rank_df
-            # 查找最接近的位次
-            if 'cumulative_count' in df.columns:
-                closest_row = df.iloc[(df['cumulative_count'] - user_rank).abs().argsort()[:1]]
-            elif 'rank' in df.columns:
-                closest_row = df.iloc[(df['rank'] - user_rank).abs().argsort()[:1]]
-            else:
-                return None
-            
-            return int(closest_row['total_score'].iloc[0]) if not closest_row.empty else None
+
+            # 在编译好的位次数组上二分查找最接近的位次
+            return table.rank_to_score(user_rank)
         except:
             return None
 
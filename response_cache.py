@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ResponseCache:
+    """AI回复持久化缓存 - SQLite存储，键为模型、提示词和温度的哈希，支持过期时间和按容量淘汰；
+    缓存只是尽力而为，数据库被锁、磁盘已满等错误只记录日志，不影响AI调用本身"""
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_bytes=50 * 1024 * 1024, enabled=True):
+        self.path = path
+        self.ttl = ttl              # 过期时间（秒），0表示永不过期
+        self.max_bytes = max_bytes  # 缓存文本总大小上限
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()  # 保护命中统计（多个请求线程同时更新）
+
+        if self.enabled:
+            try:
+                directory = os.path.dirname(os.path.abspath(path))
+                os.makedirs(directory, exist_ok=True)
+                with self._connect() as conn:
+                    conn.execute('PRAGMA journal_mode=WAL')
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS responses ('
+                        'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, '
+                        'created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+                    )
+                    conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)')
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️ AI回复缓存初始化失败，已关闭缓存: {str(e)}")
+                self.enabled = False
+
+    @contextmanager
+    def _connect(self):
+        # 每次操作使用独立连接，多线程/多进程下均可安全使用
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(model, messages, temperature):
+        """根据模型、提示词和温度生成缓存键"""
+        payload = json.dumps(
+            {'model': model, 'messages': messages, 'temperature': temperature},
+            ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """读取未过期的缓存回复，未命中或读取失败返回None"""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute('SELECT value, created_at FROM responses WHERE key = ?', (key,)).fetchone()
+                if row is not None and self.ttl and now - row[1] > self.ttl:
+                    conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                    row = None
+                if row is not None:
+                    conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+        except sqlite3.Error as e:
+            print(f"⚠️ 读取AI回复缓存失败: {str(e)}")
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def set(self, key, value):
+        """写入缓存，超出容量时按最近访问时间淘汰；写入失败时放弃本次缓存"""
+        if not self.enabled or not value:
+            return
+
+        now = time.time()
+        size = len(value.encode('utf-8'))
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                    (key, value, size, now, now)
+                )
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            print(f"⚠️ 写入AI回复缓存失败: {str(e)}")
+
+    def _evict(self, conn, now):
+        if self.ttl:
+            conn.execute('DELETE FROM responses WHERE created_at < ?', (now - self.ttl,))
+
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # 从最久未访问的记录开始删除，直到总大小回到上限以内
+        removed = []
+        for key, size in conn.execute('SELECT key, size FROM responses ORDER BY accessed_at'):
+            if total <= self.max_bytes:
+                break
+            removed.append((key,))
+            total -= size
+        conn.executemany('DELETE FROM responses WHERE key = ?', removed)
+
+    def stats(self):
+        """缓存统计"""
+        with self._lock:
+            stats = {'enabled': self.enabled, 'hits': self.hits, 'misses': self.misses, 'entries': 0, 'bytes': 0}
+        if self.enabled:
+            try:
+                with self._connect() as conn:
+                    stats['entries'], stats['bytes'] = conn.execute(
+                        'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses'
+                    ).fetchone()
+            except sqlite3.Error as e:
+                print(f"⚠️ 读取AI回复缓存统计失败: {str(e)}")
+        return stats
@@ -0,0 +1,53 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+class SchoolLabeler:
+    """985/211院校标识 - 名单编译为正则多模式匹配，每个不同的院校名称只匹配一次"""
+
+    def __init__(self, schools_985, schools_211):
+        self._985 = self._compile(schools_985)
+        self._211 = self._compile(schools_211)
+
+    @staticmethod
+    def _compile(schools):
+        # 任一院校名称是校名的子串即命中，与逐个判断 school in name 等价
+        patterns = sorted({str(school) for school in schools if str(school)}, key=len, reverse=True)
+        if not patterns:
+            return None
+        return re.compile('|'.join(re.escape(pattern) for pattern in patterns))
+
+    @staticmethod
+    def _match(matcher, names):
+        if matcher is None:
+            return np.zeros(len(names), dtype=bool)
+        return np.fromiter((matcher.search(name) is not None for name in names), dtype=bool, count=len(names))
+
+    def label(self, school_names):
+        """返回(is_985, is_211)两个布尔数组；按不同校名计算后映射回每一行"""
+        codes, uniques = pd.factorize(pd.Series(school_names, dtype=object).astype(str))
+        names = uniques.tolist()
+        return self._match(self._985, names)[codes], self._match(self._211, names)[codes]
+
+
+# 紧凑存储时985/211标识按位压缩在school_flags列中
+SCHOOL_FLAGS = {'is_985': 1, 'is_211': 2}
+
+
+def pack_school_flags(is_985, is_211):
+    """把两个布尔数组压缩为一个uint8标识数组"""
+    flags = np.zeros(len(is_985), dtype=np.uint8)
+    flags[np.asarray(is_985, dtype=bool)] |= SCHOOL_FLAGS['is_985']
+    flags[np.asarray(is_211, dtype=bool)] |= SCHOOL_FLAGS['is_211']
+    return flags
+
+
+def school_flag(df, name):
+    """取出院校标识（'is_985'或'is_211'）的布尔数组；兼容未压缩的布尔列，两者都没有时返回None"""
+    if 'school_flags' in df.columns:
+        return (df['school_flags'].to_numpy() & SCHOOL_FLAGS[name]) != 0
+    if name in df.columns:
+        return df[name].to_numpy().astype(bool)
+    return None
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+
+class ScoreRankTable:
+    """编译后的一分一档表 - 入库时构建一次，分数/位次双向查询均为二分查找"""
+
+    def __init__(self, scores, ranks, rank_keys, key_scores, key_positions):
+        self.scores = scores                # 分数（升序、唯一）
+        self.ranks = ranks                  # 与scores一一对应的位次
+        self.rank_keys = rank_keys          # 位次查分使用的键（累计人数或名次，升序）
+        self.key_scores = key_scores        # 与rank_keys一一对应的分数
+        self.key_positions = key_positions  # rank_keys在原表中的行号，用于等距时取靠前的行
+
+    @classmethod
+    def from_dataframe(cls, score_rank_df):
+        """从标准化后的一分一档表编译查找数组"""
+        if score_rank_df is None or 'total_score' not in score_rank_df.columns:
+            return cls.empty()
+
+        total_score = pd.to_numeric(score_rank_df['total_score'], errors='coerce').to_numpy(dtype=np.float64)
+
+        # 分数 -> 位次：同一分数保留原表中第一次出现的行
+        if 'rank' in score_rank_df.columns:
+            rank = pd.to_numeric(score_rank_df['rank'], errors='coerce').to_numpy(dtype=np.float64)
+            valid = ~(np.isnan(total_score) | np.isnan(rank))
+            valid_scores = total_score[valid]
+            valid_ranks = rank[valid]
+            order = np.argsort(valid_scores, kind='stable')
+            sorted_scores = valid_scores[order]
+            first = np.ones(len(sorted_scores), dtype=bool)
+            first[1:] = sorted_scores[1:] != sorted_scores[:-1]
+            scores = sorted_scores[first]
+            ranks = valid_ranks[order][first]
+        else:
+            scores = np.empty(0, dtype=np.float64)
+            ranks = np.empty(0, dtype=np.float64)
+
+        # 位次 -> 分数：优先使用累计人数，与原有查找逻辑一致
+        if 'cumulative_count' in score_rank_df.columns:
+            key_column = 'cumulative_count'
+        elif 'rank' in score_rank_df.columns:
+            key_column = 'rank'
+        else:
+            key_column = None
+
+        if key_column is not None:
+            keys = pd.to_numeric(score_rank_df[key_column], errors='coerce').to_numpy(dtype=np.float64)
+            valid = ~np.isnan(keys)
+            positions = np.flatnonzero(valid)
+            order = np.argsort(keys[valid], kind='stable')
+            rank_keys = keys[valid][order]
+            key_scores = total_score[valid][order]
+            key_positions = positions[order]
+        else:
+            rank_keys = np.empty(0, dtype=np.float64)
+            key_scores = np.empty(0, dtype=np.float64)
+            key_positions = np.empty(0, dtype=np.int64)
+
+        return cls(scores, ranks, rank_keys, key_scores, key_positions)
+
+    @classmethod
+    def empty(cls):
+        """空表"""
+        return cls.from_dataframe(pd.DataFrame(columns=['total_score', 'rank']))
+
+    def __len__(self):
+        return len(self.scores)
+
+    def scores_to_ranks(self, scores):
+        """批量分数转位次：取不高于该分数的最高分对应位次，分数低于表内最低分时返回最高分对应位次"""
+        values = np.asarray(scores, dtype=np.float64)
+        result = np.full(values.shape, np.nan)
+        if len(self.scores) == 0:
+            return result
+
+        valid = np.isfinite(values)
+        idx = np.searchsorted(self.scores, values[valid], side='right') - 1
+        idx[idx < 0] = len(self.scores) - 1
+        result[valid] = self.ranks[idx]
+        return result
+
+    def score_to_rank(self, score):
+        """单个分数转位次，无结果时返回None"""
+        rank = self.scores_to_ranks([score])[0]
+        return None if np.isnan(rank) else int(rank)
+
+    def ranks_to_scores(self, ranks):
+        """批量位次转分数：取位次最接近的一行，距离相同时取原表中靠前的行"""
+        values = np.asarray(ranks, dtype=np.float64)
+        result = np.full(values.shape, np.nan)
+        if len(self.rank_keys) == 0:
+            return result
+
+        valid = ~np.isnan(values)
+        queries = values[valid]
+        keys = self.rank_keys
+
+        right = np.searchsorted(keys, queries, side='left')
+        left = right - 1
+        has_right = right < len(keys)
+        has_left = left >= 0
+        right_c = np.minimum(right, len(keys) - 1)
+        # 左侧相同键值的一段中取原表最靠前的行
+        left_c = np.searchsorted(keys, keys[np.maximum(left, 0)], side='left')
+
+        right_diff = np.where(has_right, np.abs(keys[right_c] - queries), np.inf)
+        left_diff = np.where(has_left, np.abs(keys[left_c] - queries), np.inf)
+        tie_left = (left_diff == right_diff) & (self.key_positions[left_c] < self.key_positions[right_c])
+        pick = np.where((left_diff < right_diff) | tie_left, left_c, right_c)
+
+        result[valid] = self.key_scores[pick]
+        return result
+
+    def rank_to_score(self, rank):
+        """单个位次转分数，无结果时返回None"""
+        score = self.ranks_to_scores([rank])[0]
+        return None if np.isnan(score) else int(score)
@@ -0,0 +1,120 @@
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+
+class SearchIndex:
+    """院校/专业联想搜索索引 - 入库时由招生计划中的单个专业名称和最低分数线中的院校名称构建，构建后只读；
+    前缀查询在按名称排序的数组上二分查找，包含查询使用单字和二字n-gram倒排表（适合中文名称）"""
+
+    KINDS = ('school', 'major')
+
+    def __init__(self, kinds, names, weights):
+        self.kinds = np.asarray(kinds, dtype=object)            # 'school' 或 'major'
+        self.names = np.asarray(names, dtype=object)            # 原始名称
+        self.weights = np.asarray(weights, dtype=np.int64)      # 热度（出现次数），同等匹配时靠前
+        self._keys = [self.normalize(name) for name in self.names]
+        self._lengths = np.array([len(key) for key in self._keys], dtype=np.int64)
+
+        # 前缀：规范化名称排序后，前缀相同的名称位于连续区间
+        self._order = np.array(sorted(range(len(self._keys)), key=self._keys.__getitem__), dtype=np.int32)
+        self._sorted_keys = [self._keys[i] for i in self._order]
+
+        # n-gram倒排表：gram -> 名称编号（升序）
+        grams, ids = [], []
+        for i, key in enumerate(self._keys):
+            key_grams = self.ngrams(key)
+            grams.extend(key_grams)
+            ids.extend([i] * len(key_grams))
+        codes, vocabulary = pd.factorize(pd.Series(grams, dtype=object))
+        ids = np.asarray(ids, dtype=np.int32)
+        order = np.lexsort((ids, codes))
+        self._gram_ids = {gram: i for i, gram in enumerate(vocabulary)}
+        self._gram_starts = np.searchsorted(codes[order], np.arange(len(vocabulary) + 1))
+        self._postings = ids[order]
+
+    @classmethod
+    def from_tables(cls, plan_df, cutoff_df):
+        """从招生计划（专业名称）和最低分数线（院校名称）构建，出现次数作为热度"""
+        kinds, names, weights = [], [], []
+        for kind, df in (('major', plan_df), ('school', cutoff_df)):
+            column = 'major_name' if kind == 'major' else 'school_name'
+            if df is None or column not in df.columns:
+                continue
+            counts = df[column].dropna().astype(str).str.strip()
+            counts = counts[counts != ''].value_counts(sort=False)
+            kinds.extend([kind] * len(counts))
+            names.extend(counts.index.tolist())
+            weights.extend(counts.tolist())
+        return cls(kinds, names, weights)
+
+    @staticmethod
+    def normalize(text):
+        """规范化：全角转半角、忽略大小写和空白"""
+        return ''.join(unicodedata.normalize('NFKC', str(text)).casefold().split())
+
+    @staticmethod
+    def ngrams(key):
+        """名称的单字和二字gram（去重）"""
+        return list(set(key) | {key[i:i + 2] for i in range(len(key) - 1)})
+
+    def __len__(self):
+        return len(self.names)
+
+    def _posting(self, gram):
+        i = self._gram_ids.get(gram)
+        if i is None:
+            return np.empty(0, dtype=np.int32)
+        return self._postings[self._gram_starts[i]:self._gram_starts[i + 1]]
+
+    def search(self, query, kind=None, limit=10):
+        """联想搜索，返回前limit条[{'type', 'name', 'match'}]；
+        排序依次为：完全匹配、前缀匹配、包含、部分相似，同一档内热度高、名称短的在前"""
+        key = self.normalize(query)
+        if not key or limit <= 0:
+            return []
+
+        # 前缀匹配（含完全匹配）
+        start = bisect_left(self._sorted_keys, key)
+        stop = bisect_left(self._sorted_keys, key + '\U0010ffff', lo=start)
+        prefix = self._order[start:stop]
+
+        # 包含：查询的所有gram都出现的名称，查询多于两个字时再核对是否确实包含查询串
+        grams = [key] if len(key) == 1 else [key[i:i + 2] for i in range(len(key) - 1)]
+        postings = sorted((self._posting(gram) for gram in set(grams)), key=len)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+        contains = candidates if len(grams) == 1 else \
+            np.array([i for i in candidates if key in self._keys[i]], dtype=np.int32)
+
+        # 结果不足时补充部分相似（命中至少一半gram）的名称
+        similar = np.empty(0, dtype=np.int32)
+        if len(prefix) + len(contains) < limit and len(grams) > 1:
+            hits = np.bincount(np.concatenate(postings), minlength=len(self.names))
+            similar = np.flatnonzero(hits * 2 >= len(set(grams)))
+
+        tiers = np.full(len(self.names), 4, dtype=np.int64)
+        tiers[similar] = 3
+        tiers[contains] = 2
+        tiers[prefix] = 1
+        tiers[prefix[self._lengths[prefix] == len(key)]] = 0
+        chosen = np.flatnonzero(tiers < 4)
+        if kind in self.KINDS:
+            chosen = chosen[self.kinds[chosen] == kind]
+
+        order = np.lexsort((self._lengths[chosen], -self.weights[chosen], tiers[chosen]))[:limit]
+        labels = ('exact', 'prefix', 'contains', 'similar')
+        return [
+            {'type': self.kinds[i], 'name': self.names[i], 'match': labels[tiers[i]]}
+            for i in chosen[order].tolist()
+        ]
+
+    def memory_usage(self):
+        """索引数组占用的内存（字节，不含名称字符串）"""
+        return int(self.weights.nbytes + self._lengths.nbytes + self._order.nbytes
+                   + self._gram_starts.nbytes + self._postings.nbytes)